@@ -0,0 +1,284 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Tuple
+from urllib.parse import unquote_plus
+import orjson
+from starlette.routing import Match
+from .database import DATABASE_URL, POOL_SIZE
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "false").lower() in ("1", "true", "yes")
+# More requests in flight than the database serves at once only adds waiting inside it:
+# SQLite commits one writer at a time and backs the others off in its busy handler
+DEFAULT_CONCURRENCY = 2 if DATABASE_URL.startswith("sqlite") else POOL_SIZE
+MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", str(DEFAULT_CONCURRENCY)))
+QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "100"))
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "500")) / 1000
+USER_RATE_LIMIT = float(os.getenv("USER_RATE_LIMIT", "20"))  # requests per second per user, 0 disables
+USER_RATE_BURST = float(os.getenv("USER_RATE_BURST", "40"))
+ROUTE_RATE_LIMITS = os.getenv("ROUTE_RATE_LIMITS", "")  # "GET /api/progress/game-stats=200:400,..."
+MAX_TRACKED_USERS = int(os.getenv("ADMISSION_MAX_TRACKED_USERS", "100000"))
+
+EXEMPT_PATHS = ("/health", "/metrics", "/docs", "/redoc", "/openapi.json")
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+class TokenBucket:
+    """Allows `rate` requests per second on average and up to `burst` at once"""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Spend one token; returns 0 if granted, otherwise seconds until one is available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+def parse_route_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    """Parse "METHOD /path/template=rate:burst,..." into {"METHOD /path/template": (rate, burst)}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        route, _, value = item.rpartition("=")
+        rate, _, burst = value.partition(":")
+        if not route or not rate:
+            raise ValueError(f"ROUTE_RATE_LIMITS entry {item!r} is not 'METHOD /path=rate[:burst]'")
+        method, _, path = route.strip().partition(" ")
+        limits[f"{method.upper()} {path.strip()}"] = (float(rate), float(burst or rate))
+    return limits
+
+class ConcurrencyLimiter:
+    """At most `limit` requests in flight; up to `queue_size` more wait in FIFO order.
+
+    Writes wait in their own queue, which is served before the reads', and
+    a write arriving at a full queue evicts the newest read, so a read flood
+    does not shed or delay submissions beyond the requests already in
+    flight. A released slot is handed straight to the next waiter.
+    """
+
+    def __init__(self, limit: int = MAX_CONCURRENCY, queue_size: int = QUEUE_SIZE, timeout: float = QUEUE_TIMEOUT):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waited = 0
+        self.evicted = 0
+        self._writes = deque()
+        self._reads = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._writes) + len(self._reads)
+
+    async def acquire(self, write: bool) -> Optional[str]:
+        """Take a slot; returns None once admitted, or why the request was shed"""
+        if self.in_flight < self.limit and not self.queued:
+            self.in_flight += 1
+            return None
+        if self.queued >= self.queue_size:
+            # A write takes the place of the newest queued read. A read that
+            # timed out or was cancelled stays queued until its waiter resumes;
+            # popping it frees its place without evicting anyone.
+            while write and self._reads and self.queued >= self.queue_size:
+                waiter = self._reads.pop()
+                if not waiter.done():
+                    waiter.set_result("queue_full")
+                    self.evicted += 1
+            if self.queued >= self.queue_size:
+                return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self._writes if write else self._reads
+        queue.append(waiter)
+        self.waited += 1
+        try:
+            return await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            # A slot handed over just as the timeout fired still counts
+            if waiter.done() and not waiter.cancelled():
+                return waiter.result()
+            return "queue_timeout"
+        except asyncio.CancelledError:
+            # The client went away after being handed a slot; pass it on
+            if waiter.done() and not waiter.cancelled() and waiter.result() is None:
+                self.release()
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    queue.remove(waiter)
+                except ValueError:
+                    pass
+
+    def release(self):
+        for queue in (self._writes, self._reads):
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self.in_flight -= 1
+
+class AdmissionController:
+    """Per-user and per-route token buckets in front of a global concurrency limit.
+
+    Users are identified by the `user_id` path or query parameter. Requests
+    without one, such as submissions, only count against their route's
+    bucket: client addresses are shared behind proxies and NAT.
+    """
+
+    def __init__(self, user_rate: float = USER_RATE_LIMIT, user_burst: float = USER_RATE_BURST,
+                 route_limits: str = ROUTE_RATE_LIMITS, max_users: int = MAX_TRACKED_USERS,
+                 limiter: Optional[ConcurrencyLimiter] = None):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_users = max_users
+        self.route_limits = parse_route_limits(route_limits)
+        self.limiter = limiter or ConcurrencyLimiter()
+        self._users: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._routes: Dict[str, TokenBucket] = {}
+        self._service_time = 0.0  # moving average of admitted request durations
+        self.admitted = 0
+        self.rejected = {"user_rate": 0, "route_rate": 0, "queue_full": 0, "queue_timeout": 0}
+        self.max_queue_wait = 0.0
+
+    def check_rate(self, user_id: Optional[str], route: Optional[str], now: float) -> Optional[Tuple[str, float]]:
+        """Spend a token from the user's and the route's bucket; returns (reason, retry_after) if either is empty"""
+        if user_id is not None and self.user_rate > 0:
+            bucket = self._users.get(user_id)
+            if bucket is None:
+                bucket = self._users[user_id] = TokenBucket(self.user_rate, self.user_burst, now)
+                if len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            else:
+                self._users.move_to_end(user_id)
+            wait = bucket.take(now)
+            if wait:
+                return "user_rate", wait
+
+        limit = self.route_limits.get(route) if route is not None else None
+        if limit is not None:
+            bucket = self._routes.get(route)
+            if bucket is None:
+                bucket = self._routes[route] = TokenBucket(*limit, now)
+            wait = bucket.take(now)
+            if wait:
+                return "route_rate", wait
+        return None
+
+    def retry_after(self) -> float:
+        """Roughly how long the current queue takes to drain"""
+        limiter = self.limiter
+        return (limiter.queued + 1) * self._service_time / max(limiter.limit, 1)
+
+    def observe(self, duration: float):
+        self._service_time += 0.05 * (duration - self._service_time)
+
+    def status(self) -> dict:
+        return {
+            "enabled": ADMISSION_CONTROL,
+            "max_concurrency": self.limiter.limit,
+            "in_flight": self.limiter.in_flight,
+            "queue_depth": self.limiter.queued,
+            "queue_size": self.limiter.queue_size,
+            "admitted": self.admitted,
+            "queued": self.limiter.waited,
+            "evicted": self.limiter.evicted,
+            "rejected": dict(self.rejected),
+            "max_queue_wait_ms": round(self.max_queue_wait * 1000, 3),
+            "tracked_users": len(self._users),
+            "route_limits": {route: {"rate": rate, "burst": burst}
+                             for route, (rate, burst) in self.route_limits.items()},
+        }
+
+admission = AdmissionController()
+
+def _resolve(scope) -> Tuple[Optional[object], dict]:
+    """The route the router will pick and its path parameters, matched ahead of routing"""
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, child_scope = route.matches(scope)
+        if match != Match.NONE:
+            return route, child_scope.get("path_params", {})
+    return None, {}
+
+def _user_id(scope, path_params: dict) -> Optional[str]:
+    """The user a request reads for, from the path or the query string"""
+    user_id = path_params.get("user_id")
+    if user_id is None and b"user_id=" in scope.get("query_string", b""):
+        for pair in scope["query_string"].split(b"&"):
+            name, _, value = pair.partition(b"=")
+            if name == b"user_id" and value:
+                return unquote_plus(value.decode("latin-1"))
+    return user_id
+
+async def _reject(send, status: int, detail: str, retry_after: float):
+    body = orjson.dumps({"detail": detail})
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+class AdmissionMiddleware:
+    """ASGI middleware that sheds load before it reaches the handlers and the DB pool.
+
+    Rate-limited requests get 429 and overload gets 503, both with
+    Retry-After, without touching the database.
+    """
+
+    def __init__(self, app, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller
+        method = scope["method"]
+        route, path_params = _resolve(scope)
+        now = time.monotonic()
+        limited = controller.check_rate(
+            _user_id(scope, path_params), f"{method} {route.path}" if route is not None else None, now
+        )
+        if limited is not None:
+            reason, wait = limited
+            controller.rejected[reason] += 1
+            # Lets instrumentation label the rejection with its route
+            if route is not None:
+                scope["route"] = route
+            await _reject(send, 429, "Rate limit exceeded", wait)
+            return
+
+        limiter = controller.limiter
+        shed = await limiter.acquire(method not in READ_METHODS)
+        started = time.monotonic()
+        if shed is not None:
+            controller.rejected[shed] += 1
+            if route is not None:
+                scope["route"] = route
+            await _reject(send, 503, "Server is overloaded", controller.retry_after())
+            return
+
+        controller.admitted += 1
+        controller.max_queue_wait = max(controller.max_queue_wait, started - now)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+            controller.observe(time.monotonic() - started)
@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+from ..admission import admission
+from ..database import pool_status
+from ..instrumentation import PROFILE_DIR, profiler, registry
+from ..services.cache import cache
+from ..services.idempotency import idempotency_index
+from ..services.invalidation_bus import invalidation_bus
+from ..services.stats_writer import stats_writer
+from ..services.user_keys import user_keys
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@router.get("", response_class=PlainTextResponse)
+async def get_metrics():
+    """Per-route request, SQL statement and DB time metrics in Prometheus text format"""
+    pool = pool_status()
+    cache_status = cache.status()
+    queue = stats_writer.status()
+    bus = invalidation_bus.status()
+    replays = idempotency_index.status()
+    interned = user_keys.status()
+    shedding = admission.status()
+    extra = {
+        "db_pool_in_use": pool.get("in_use", 0),
+        "db_pool_checkouts_total": pool["checkouts"],
+        "db_pool_checkout_timeouts_total": pool["checkout_timeouts"],
+        "cache_hits_total": cache_status["hits"],
+        "cache_misses_total": cache_status["misses"],
+        "cache_evictions_total": cache_status["evictions"],
+        "stats_queue_depth": queue["depth"],
+        "invalidation_received_total": bus["received"],
+        "invalidation_resyncs_total": bus["resyncs"],
+        "invalidation_stale_rows_total": bus["stale_rows"],
+        "invalidation_lag_seconds_max": bus["lag_seconds"]["max"],
+        "invalidation_lag_seconds_p99": bus["lag_seconds"]["p99"] or 0.0,
+        "idempotency_index_hits_total": replays["hits"],
+        "idempotency_index_misses_total": replays["misses"],
+        "idempotency_db_hits_total": replays["db_hits"],
+        "user_key_cache_hits_total": interned["hits"],
+        "user_key_cache_misses_total": interned["misses"],
+        "users_created_total": interned["created"],
+        "admission_in_flight": shedding["in_flight"],
+        "admission_queue_depth": shedding["queue_depth"],
+        "admission_admitted_total": shedding["admitted"],
+        "admission_queued_total": shedding["queued"],
+        "admission_evicted_reads_total": shedding["evicted"],
+        "admission_rejected_user_rate_total": shedding["rejected"]["user_rate"],
+        "admission_rejected_route_rate_total": shedding["rejected"]["route_rate"],
+        "admission_rejected_queue_full_total": shedding["rejected"]["queue_full"],
+        "admission_rejected_queue_timeout_total": shedding["rejected"]["queue_timeout"],
+        "admission_queue_wait_seconds_max": shedding["max_queue_wait_ms"] / 1000,
+    }
+    return PlainTextResponse(registry.render(extra), media_type="text/plain; version=0.0.4")
+
+@router.get("/slow-queries")
+async def get_slow_queries():
+    """Most recent statements slower than SLOW_QUERY_MS, by route"""
+    return registry.slow_queries()
+
+@router.post("/profiler")
+async def toggle_profiler(enabled: bool = Query(..., description="Start or stop sampling slow requests")):
+    """Turn the slow-request sampling profiler on or off"""
+    if enabled:
+        profiler.start()
+    else:
+        profiler.stop()
+    return {"enabled": profiler.running, "dumps": profiler.dumps, "directory": PROFILE_DIR}
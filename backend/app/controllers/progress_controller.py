@@ -1,72 +1,188 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import date, datetime
+import logging
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta
 from typing import List, Optional
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..services.progress_service import ProgressService
-from ..models.user_progress import UserProgress
+from ..services.analytics_service import AnalyticsService
+from ..services.game_leaderboard_service import GameLeaderboardService, PERIODS
+from ..services.game_stats_cache import game_stats_cache
+from ..services.leaderboard_index import leaderboard_index
+from ..services.response_cache import data_version, etag_matches, response_cache
 from ..schemas.progress_schemas import (
     ProgressCreate, ProgressResponse, UserStatsResponse, 
+    ProgressBatchCreate, ProgressBatchItemResult, ProgressBatchResponse, ProgressPageResponse,
     DailyProgressResponse, LeaderboardResponse, LeaderboardEntry,
-    GameStatsResponse, MockLeaderboardResponse, MockLeaderboardEntry
+    GameStatsResponse, MockLeaderboardResponse, MockLeaderboardEntry,
+    RankedEntry, UserRankResponse, GameLeaderboardResponse, GameDistributionResponse
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/api/progress", tags=["progress"])
 
+CONFLICT_DETAIL = "Progress conflicts with stored data and was not saved"
+
+def _render(model: BaseModel, **kwargs) -> ORJSONResponse:
+    """Render an already validated model with orjson, bypassing response_model re-validation"""
+    return ORJSONResponse(model.model_dump(), **kwargs)
+
+def _row_dicts(rows) -> List[dict]:
+    # Column-only rows are already typed by the database, so they skip Pydantic entirely
+    return [row._asdict() for row in rows]
+
+def _version_headers() -> dict:
+    return {"ETag": data_version.etag, "Last-Modified": data_version.last_modified, "Cache-Control": "no-cache"}
+
+def _not_modified(request: Request) -> Optional[Response]:
+    if etag_matches(request.headers.get("if-none-match"), data_version.etag):
+        return Response(status_code=304, headers=_version_headers())
+    return None
+
+def _cached_response(request: Request, key: str) -> Optional[Response]:
+    """304 if the client already has the current version, else its stored body if rendered"""
+    not_modified = _not_modified(request)
+    if not_modified is not None:
+        return not_modified
+    body = response_cache.get(key, data_version.etag)
+    if body is not None:
+        return Response(content=body, media_type="application/json", headers=_version_headers())
+    return None
+
+def _render_versioned(key: str, model: BaseModel) -> Response:
+    """Serialize once and keep the bytes until the data version moves on"""
+    body = ORJSONResponse(model.model_dump()).body
+    response_cache.set(key, data_version.etag, body)
+    return Response(content=body, media_type="application/json", headers=_version_headers())
+
 @router.post("/", response_model=ProgressResponse)
 async def create_progress(
     progress_data: ProgressCreate,
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(default=None, max_length=255, description="Makes retries safe"),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Create a new progress entry for a user"""
+    """Create a new progress entry for a user; a repeated idempotency key returns the original entry"""
+    key = idempotency_key or progress_data.idempotency_key
     try:
         service = ProgressService(db)
-        progress = service.create_progress_entry(progress_data)
+        if key is None:
+            return await service.create_progress_entry(progress_data)
+        progress, replayed = await service.create_idempotent_entry(progress_data, key)
+        if replayed:
+            return _render(progress, headers={"Idempotent-Replayed": "true"})
         return progress
+    except IntegrityError:
+        # The violated constraint and its SQL go to the log, not the client
+        logger.exception("Progress submission violated a database constraint")
+        raise HTTPException(status_code=409, detail=CONFLICT_DETAIL)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/batch", response_model=ProgressBatchResponse)
+async def create_progress_batch(
+    batch: ProgressBatchCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """Create many progress entries, possibly for many users, in one transaction"""
+    results: List[Optional[ProgressBatchItemResult]] = [None] * len(batch.items)
+    valid = []
+    for index, raw_item in enumerate(batch.items):
+        if raw_item.get("idempotency_key") is not None:
+            results[index] = ProgressBatchItemResult(
+                index=index, status="error", error="idempotency_key is only supported by POST /api/progress/"
+            )
+            continue
+        try:
+            valid.append((index, ProgressCreate.model_validate(raw_item)))
+        except ValidationError as e:
+            message = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+            results[index] = ProgressBatchItemResult(index=index, status="error", error=message)
+    
+    try:
+        service = ProgressService(db)
+        created = await service.create_progress_batch([item for _, item in valid])
+    except IntegrityError:
+        logger.exception("Progress batch violated a database constraint")
+        raise HTTPException(status_code=409, detail=CONFLICT_DETAIL)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    for (index, _), progress in zip(valid, created):
+        results[index] = ProgressBatchItemResult(
+            index=index,
+            status="created",
+            progress=ProgressResponse.model_validate(progress)
+        )
+    
+    return ProgressBatchResponse(
+        results=results,
+        created=len(created),
+        failed=len(batch.items) - len(created)
+    )
+
 @router.get("/user/{user_id}", response_model=List[ProgressResponse])
 async def get_user_progress(
     user_id: str,
     limit: int = Query(default=50, le=100),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get user's recent progress entries"""
     service = ProgressService(db)
-    progress_entries = service.get_user_progress(user_id, limit)
-    return progress_entries
+    rows = await service.get_user_progress(user_id, limit)
+    return ORJSONResponse(_row_dicts(rows))
+
+@router.get("/user/{user_id}/history", response_model=ProgressPageResponse)
+async def get_user_history(
+    user_id: str,
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+    limit: int = Query(default=50, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Page through a user's full history, newest first"""
+    service = ProgressService(db)
+    try:
+        entries, next_cursor = await service.get_user_progress_page(user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return ORJSONResponse({"entries": _row_dicts(entries), "next_cursor": next_cursor})
+
+@router.get("/user/{user_id}/export")
+async def export_user_history(
+    user_id: str,
+    export_format: str = Query(default="ndjson", alias="format", pattern="^(ndjson|csv)$", description="ndjson or csv")
+):
+    """Stream a user's complete history as NDJSON or CSV"""
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        ProgressService.export_user_progress(user_id, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{user_id}-history.{export_format}"'}
+    )
 
 @router.get("/user/{user_id}/stats", response_model=UserStatsResponse)
 async def get_user_stats(
     user_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get user's overall statistics"""
     service = ProgressService(db)
-    stats = service.get_user_stats(user_id)
+    stats = await service.get_user_stats(user_id)
     
     if not stats:
         raise HTTPException(status_code=404, detail="User stats not found")
     
-    return UserStatsResponse(
-        user_id=stats.user_id,
-        total_games_played=stats.total_games_played,
-        best_time=stats.best_time,
-        average_time=stats.average_time,
-        average_lives_remaining=stats.average_lives_remaining,
-        total_score=stats.total_score,
-        current_streak=stats.current_streak,
-        longest_streak=stats.longest_streak,
-        last_played=stats.last_played
-    )
+    return _render(stats)
 
 @router.get("/user/{user_id}/daily", response_model=DailyProgressResponse)
 async def get_daily_progress(
     user_id: str,
     target_date: Optional[str] = Query(default=None, description="Date in YYYY-MM-DD format"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get user's progress for a specific day (defaults to today)"""
     if target_date:
@@ -78,17 +194,26 @@ async def get_daily_progress(
         parsed_date = date.today()
     
     service = ProgressService(db)
-    daily_progress = service.get_daily_progress(user_id, parsed_date)
-    return daily_progress
+    daily_progress = await service.get_daily_progress(user_id, parsed_date)
+    return _render(daily_progress)
 
 @router.get("/leaderboard", response_model=LeaderboardResponse)
 async def get_leaderboard(
+    request: Request,
     limit: int = Query(default=10, le=50),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get leaderboard of top players by best completion time"""
+    # Versioned responses need the in-memory index; a cold start reads SQL uncached
+    versioned = leaderboard_index.is_warm
+    key = f"leaderboard:{limit}"
+    if versioned:
+        cached = _cached_response(request, key)
+        if cached is not None:
+            return cached
+    
     service = ProgressService(db)
-    top_users = service.get_leaderboard(limit)
+    top_users = await service.get_leaderboard(limit)
     
     entries = [
         LeaderboardEntry(
@@ -100,34 +225,115 @@ async def get_leaderboard(
         for user in top_users
     ]
     
-    return LeaderboardResponse(
+    response = LeaderboardResponse(
         entries=entries,
         total_users=len(entries)
     )
+    return _render_versioned(key, response) if versioned else _render(response)
+
+@router.get("/leaderboard/rank/{user_id}", response_model=UserRankResponse)
+async def get_user_rank(
+    user_id: str,
+    radius: int = Query(default=2, ge=0, le=25, description="Players to include either side"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get a user's leaderboard rank and the players around them"""
+    service = ProgressService(db)
+    user_rank = await service.get_user_rank(user_id, radius)
+    
+    if not user_rank:
+        raise HTTPException(status_code=404, detail="User has no ranked time")
+    
+    neighbors = [
+        RankedEntry(
+            rank=rank,
+            user_id=user.user_id,
+            best_time=user.best_time,
+            total_games=user.total_games_played,
+            average_time=user.average_time or 0
+        )
+        for rank, user in user_rank["neighbors"]
+    ]
+    
+    return _render(UserRankResponse(
+        user_id=user_rank["user_id"],
+        rank=user_rank["rank"],
+        total_players=user_rank["total_players"],
+        neighbors=neighbors
+    ))
+
+@router.get("/leaderboard/game/{game_type}", response_model=GameLeaderboardResponse)
+async def get_game_leaderboard(
+    game_type: str,
+    period: str = Query(default="all-time", description="daily, weekly or all-time"),
+    target_date: Optional[str] = Query(default=None, description="Date in YYYY-MM-DD format within the period"),
+    limit: int = Query(default=10, le=50),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get the leaderboard for one game type over a day, week or all time"""
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"Invalid period. Use one of: {', '.join(PERIODS)}")
+    if target_date:
+        try:
+            parsed_date = datetime.strptime(target_date, "%Y-%m-%d").date()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    else:
+        parsed_date = datetime.utcnow().date()
+    
+    service = GameLeaderboardService(db)
+    board = await service.get_leaderboard(game_type, period, parsed_date, limit)
+    
+    entries = [
+        RankedEntry(
+            rank=rank,
+            user_id=entry.user_id,
+            best_time=entry.best_time,
+            total_games=entry.games_played,
+            average_time=entry.total_completion_time / entry.games_played if entry.games_played else 0
+        )
+        for rank, entry in enumerate(board["entries"], start=1)
+    ]
+    
+    return _render(GameLeaderboardResponse(
+        game_type=board["game_type"],
+        period=board["period"],
+        entries=entries,
+        total_players=board["total_players"]
+    ))
 
 @router.get("/game-stats", response_model=GameStatsResponse)
-async def get_game_stats(db: Session = Depends(get_db)):
+async def get_game_stats(request: Request, db: AsyncSession = Depends(get_db)):
     """Get overall game statistics"""
+    # While the in-memory totals are fresh, a current tag is answered without touching them
+    not_modified = _not_modified(request) if game_stats_cache.is_fresh else None
+    if not_modified is not None:
+        return not_modified
     service = ProgressService(db)
-    stats = service.get_game_stats()
+    # Only reaches the database when the in-memory totals are due for a reload,
+    # which reads the primary so no folded-in submission is lost
+    stats = await service.get_game_stats()
+    cached = _cached_response(request, "game-stats")
+    if cached is not None:
+        return cached
     
-    return GameStatsResponse(
+    return _render_versioned("game-stats", GameStatsResponse(
         total_players=stats["total_players"],
         average_completion_time=stats["average_completion_time"],
         average_lives_remaining=stats["average_lives_remaining"],
         total_games_played=stats["total_games_played"],
         completion_rate=stats["completion_rate"]
-    )
+    ))
 
 @router.get("/mock-leaderboard", response_model=MockLeaderboardResponse)
 async def get_mock_leaderboard(
     user_id: Optional[str] = Query(default=None, description="User ID to find rank for"),
     limit: int = Query(default=10, le=50),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get mock leaderboard with realistic data"""
     service = ProgressService(db)
-    leaderboard_data = service.get_mock_leaderboard(user_id, limit)
+    leaderboard_data = await service.get_mock_leaderboard(user_id, limit)
     
     entries = [
         MockLeaderboardEntry(
@@ -149,45 +355,43 @@ async def get_mock_leaderboard(
 @router.get("/game-stats/{game_type}", response_model=GameStatsResponse)
 async def get_game_type_stats(
     game_type: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_db)
 ):
     """Get statistics for a specific game type"""
+    not_modified = _not_modified(request) if game_stats_cache.is_fresh else None
+    if not_modified is not None:
+        return not_modified
     service = ProgressService(db)
+    stats = await service.get_game_type_stats(game_type)
+    key = f"game-stats:{game_type}"
+    cached = _cached_response(request, key)
+    if cached is not None:
+        return cached
     
-    # Filter by game type
-    total_games = db.query(func.count(UserProgress.id))\
-        .filter(UserProgress.game_type == game_type)\
-        .scalar() or 0
-    
-    total_players = db.query(func.count(func.distinct(UserProgress.user_id)))\
-        .filter(UserProgress.game_type == game_type)\
-        .scalar() or 0
-    
-    if total_games == 0:
-        return GameStatsResponse(
-            total_players=0,
-            average_completion_time=0.0,
-            average_lives_remaining=0.0,
-            total_games_played=0,
-            completion_rate=0.0
-        )
+    return _render_versioned(key, GameStatsResponse(
+        total_players=stats["total_players"],
+        average_completion_time=stats["average_completion_time"],
+        average_lives_remaining=stats["average_lives_remaining"],
+        total_games_played=stats["total_games_played"],
+        completion_rate=stats["completion_rate"]
+    ))
+
+@router.get("/game-stats/{game_type}/distribution", response_model=GameDistributionResponse)
+async def get_game_type_distribution(
+    game_type: str,
+    start_date: Optional[date] = Query(default=None, description="First day, YYYY-MM-DD (default: 6 days before end_date)"),
+    end_date: Optional[date] = Query(default=None, description="Last day, YYYY-MM-DD (default: today)"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Completion-time percentiles and histograms per day, from the nightly rollup"""
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=6)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    if (end_date - start_date).days >= 366:
+        raise HTTPException(status_code=400, detail="Date range is limited to 366 days")
     
-    avg_time = db.query(func.avg(UserProgress.completion_time))\
-        .filter(UserProgress.game_type == game_type)\
-        .scalar() or 0.0
-    
-    avg_lives = db.query(func.avg(UserProgress.lives_remaining))\
-        .filter(UserProgress.game_type == game_type)\
-        .scalar() or 0.0
-    
-    completed_games = db.query(func.count(UserProgress.id))\
-        .filter(UserProgress.game_type == game_type, UserProgress.completed == True)\
-        .scalar() or 0
-    
-    return GameStatsResponse(
-        total_players=total_players,
-        average_completion_time=round(avg_time, 2),
-        average_lives_remaining=round(avg_lives, 2),
-        total_games_played=total_games,
-        completion_rate=round((completed_games / total_games) * 100, 2) if total_games > 0 else 0.0
-    )
\ No newline at end of file
+    service = AnalyticsService(db)
+    distribution = await service.get_distribution(game_type, start_date, end_date)
+    return _render(GameDistributionResponse(**distribution))
\ No newline at end of file
@@ -1,25 +1,262 @@
-from sqlalchemy import create_engine
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import List, Optional
+import itertools
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from fastapi import Request
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./game_progress.db")
 
-# For SQLite fallback
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-else:
-    engine = create_engine(DATABASE_URL)
+# Connection pool tuning
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds before a connection is replaced
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))  # seconds
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Monthly range partitions for user_progress; Postgres only, SQLite keeps one table
+PARTITION_PROGRESS = (
+    os.getenv("PROGRESS_PARTITIONING", "false").lower() in ("1", "true", "yes")
+    and DATABASE_URL.startswith(("postgres://", "postgresql"))
+)
+PROGRESS_RETENTION_MONTHS = int(os.getenv("PROGRESS_RETENTION_MONTHS", "3"))  # full months of raw rows kept
+
+# Read replicas for GET endpoints; comma-separated URLs, empty sends everything to the primary
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_STRATEGY = os.getenv("REPLICA_STRATEGY", "round_robin")  # round_robin or least_connections
+REPLICA_STICKINESS = float(os.getenv("REPLICA_STICKINESS_SECONDS", "5"))  # reads pinned to the primary after a write
+
+def to_async_url(url: str) -> str:
+    """Point a plain database URL at its async driver (asyncpg / aiosqlite)"""
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+class PoolMetrics:
+    """Checkout wait times and timeouts, used to size the pool from real traffic"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "avg_checkout_wait_ms": round(self.total_wait / attempts * 1000, 3) if attempts else 0.0,
+                "max_checkout_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+pool_metrics = PoolMetrics()
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_metrics.record(time.perf_counter() - started)
+        return connection
+
+def _pool_options(url: str) -> dict:
+    # In-memory SQLite has to share a single connection, keep the dialect default
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/") == "sqlite:"):
+        return {}
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed while a writer holds the lock
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT * 1000}")
+    cursor.close()
+
+def build_engine(url: str):
+    """Async engine with the shared pool settings"""
+    # For SQLite fallback: wait on the file lock instead of failing concurrent writers
+    if url.startswith("sqlite"):
+        sqlite_engine = create_async_engine(
+            to_async_url(url),
+            connect_args={"timeout": SQLITE_BUSY_TIMEOUT},
+            **_pool_options(url)
+        )
+        event.listen(sqlite_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        return sqlite_engine
+    return create_async_engine(to_async_url(url), **_pool_options(url))
+
+_engine = None
+
+def get_engine():
+    """The primary engine, built on first use.
+
+    Building it loads the driver but opens no connection. The app's
+    lifespan hook calls this at startup; scripts get it from SessionLocal.
+    """
+    global _engine
+    if _engine is None:
+        _engine = build_engine(DATABASE_URL)
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+class LazySessionmaker(async_sessionmaker):
+    """Session factory that builds the primary engine the first time a session is opened"""
+
+    def __call__(self, **local_kw) -> AsyncSession:
+        get_engine()
+        return super().__call__(**local_kw)
+
+SessionLocal = LazySessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+def pool_status() -> dict:
+    """Current pool occupancy plus cumulative checkout wait metrics"""
+    pool = get_engine().pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update({
+            "size": pool.size(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": MAX_OVERFLOW,
+        })
+    status.update(pool_metrics.snapshot())
+    return status
+
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
+
+class ReplicaRouter:
+    """Sends read-only sessions to replica engines, and a user's reads to the primary right after they write.
+
+    Replicas are picked round-robin or by fewest sessions in flight. A write
+    pins that user's reads to the primary for REPLICA_STICKINESS seconds,
+    which should exceed the replicas' usual lag, so people always see their
+    own submissions. Reads not tied to a user go to a replica.
+    """
+
+    def __init__(self, urls: List[str] = REPLICA_URLS, strategy: str = REPLICA_STRATEGY,
+                 stickiness: float = REPLICA_STICKINESS):
+        self.urls = urls
+        self.strategy = strategy
+        self.stickiness = stickiness
+        self._engines: Optional[list] = None
+        self.sessionmakers = []
+        self.in_flight = [0] * len(urls)
+        self.reads = [0] * len(urls)
+        self.primary_reads = 0
+        self._turn = itertools.count()
+        # user_id -> monotonic expiry; one fixed window, so insertion order is expiry order
+        self._sticky: "OrderedDict[str, float]" = OrderedDict()
+
+    @property
+    def engines(self) -> list:
+        """Replica engines, built on first use like the primary's"""
+        if self._engines is None:
+            self._engines = [build_engine(url) for url in self.urls]
+            self.sessionmakers = [
+                async_sessionmaker(bind=replica, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+                for replica in self._engines
+            ]
+        return self._engines
+
+    def mark_written(self, user_id: str):
+        """Pin the user's reads to the primary for the stickiness window"""
+        now = time.monotonic()
+        self._sticky.pop(user_id, None)
+        self._sticky[user_id] = now + self.stickiness
+        while self._sticky:
+            oldest, expiry = next(iter(self._sticky.items()))
+            if expiry > now:
+                break
+            del self._sticky[oldest]
+
+    def is_sticky(self, user_id: Optional[str]) -> bool:
+        expiry = self._sticky.get(user_id) if user_id is not None else None
+        return expiry is not None and expiry > time.monotonic()
+
+    def pick(self) -> int:
+        if self.strategy == "least_connections":
+            return min(range(len(self.engines)), key=lambda index: (self.in_flight[index], self.reads[index]))
+        return next(self._turn) % len(self.engines)
+
+    @asynccontextmanager
+    async def session(self, user_id: Optional[str] = None):
+        """Read-only session: a replica unless there are none or the user wrote recently"""
+        if not self.engines or self.is_sticky(user_id):
+            self.primary_reads += 1
+            async with SessionLocal() as db:
+                yield db
+            return
+        index = self.pick()
+        self.in_flight[index] += 1
+        self.reads[index] += 1
+        try:
+            async with self.sessionmakers[index]() as db:
+                yield db
+        finally:
+            self.in_flight[index] -= 1
+
+    def status(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "primary_reads": self.primary_reads,
+            "sticky_users": sum(1 for expiry in self._sticky.values() if expiry > time.monotonic()),
+            "replicas": [
+                {"host": replica.url.host or replica.url.database, "in_flight": in_flight, "reads": reads}
+                for replica, in_flight, reads in zip(self.engines, self.in_flight, self.reads)
+            ]
+        }
+
+    async def dispose(self):
+        for replica in self._engines or ():
+            await replica.dispose()
+
+read_replicas = ReplicaRouter()
+
+async def get_read_db(request: Request):
+    """Session for read-only endpoints, routed by read_replicas on the request's user_id"""
+    user_id = request.path_params.get("user_id") or request.query_params.get("user_id")
+    async with read_replicas.session(user_id) as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
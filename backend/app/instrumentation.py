@@ -0,0 +1,254 @@
+import contextvars
+import os
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event
+
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_SAMPLES = int(os.getenv("SLOW_QUERY_SAMPLES", "20"))  # kept per route
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+PROFILE_SLOW_REQUESTS = os.getenv("PROFILE_SLOW_REQUESTS", "false").lower() in ("1", "true", "yes")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_COOLDOWN = float(os.getenv("PROFILE_COOLDOWN", "10"))  # seconds between dumps for one route
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class RequestStats:
+    """SQL work done on behalf of one request"""
+    __slots__ = ("statements", "db_time", "slow_queries")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.slow_queries: List[Tuple[str, float]] = []
+
+# Work outside any request (background tasks, startup) is attributed here
+_background = RequestStats()
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+class RouteMetrics:
+    __slots__ = ("requests", "statuses", "duration_sum", "buckets", "statements", "db_time", "slow_queries")
+
+    def __init__(self):
+        self.requests = 0
+        self.statuses: Counter = Counter()
+        self.duration_sum = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.statements = 0
+        self.db_time = 0.0
+        self.slow_queries = 0
+
+class MetricsRegistry:
+    """Per-route request, statement and DB-time totals in Prometheus text format"""
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self._slow_samples: Dict[str, deque] = {}
+
+    def observe(self, method: str, route: str, status: int, duration: float, stats: RequestStats):
+        metrics = self._routes.get((method, route))
+        if metrics is None:
+            metrics = self._routes[(method, route)] = RouteMetrics()
+        metrics.requests += 1
+        metrics.statuses[status] += 1
+        metrics.duration_sum += duration
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                metrics.buckets[index] += 1
+                break
+        metrics.statements += stats.statements
+        metrics.db_time += stats.db_time
+        metrics.slow_queries += len(stats.slow_queries)
+        if stats.slow_queries:
+            samples = self._slow_samples.setdefault(route, deque(maxlen=SLOW_QUERY_SAMPLES))
+            for statement, seconds in stats.slow_queries:
+                samples.append({
+                    "method": method,
+                    "statement": statement,
+                    "duration_ms": round(seconds * 1000, 3),
+                    "at": time.time()
+                })
+
+    def slow_queries(self) -> Dict[str, list]:
+        return {route: list(samples) for route, samples in self._slow_samples.items()}
+
+    def render(self, extra: Optional[Dict[str, float]] = None) -> str:
+        lines = [
+            "# HELP http_requests_total Requests handled, by route and status",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route), metrics in self._routes.items():
+            for status, count in sorted(metrics.statuses.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+        lines += [
+            "# HELP http_request_duration_seconds Time from request start to last body byte",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), metrics in self._routes.items():
+            labels = f'method="{method}",route="{route}"'
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, metrics.buckets):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {metrics.requests}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {metrics.duration_sum:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {metrics.requests}")
+
+        for name, kind, help_text, value in (
+            ("db_statements_total", "counter", "SQL statements executed", lambda m: m.statements),
+            ("db_time_seconds_total", "counter", "Time spent in cursor execute", lambda m: f"{m.db_time:.6f}"),
+            ("db_slow_queries_total", "counter", f"Statements slower than {SLOW_QUERY_MS:g}ms",
+             lambda m: m.slow_queries),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for (method, route), metrics in self._routes.items():
+                lines.append(f'{name}{{method="{method}",route="{route}"}} {value(metrics)}')
+            if name == "db_statements_total":
+                lines.append(f'{name}{{method="",route="background"}} {_background.statements}')
+            elif name == "db_time_seconds_total":
+                lines.append(f'{name}{{method="",route="background"}} {_background.db_time:.6f}')
+
+        for name, value in (extra or {}).items():
+            kind = "counter" if name.endswith("_total") else "gauge"
+            lines += [f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+class SamplingProfiler:
+    """Samples the event loop thread's stack so slow requests can be dumped as folded stacks.
+
+    Requests share the loop thread, so a dump holds every stack sampled while
+    the slow request was in flight, including its concurrent neighbours. The
+    output is one "frame;frame;frame count" line per stack, the input format
+    of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000, retention: float = 30.0):
+        self.interval = interval
+        self._samples = deque(maxlen=max(1, int(retention / interval)))
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._target: Optional[int] = None
+        self._last_dump: Dict[str, float] = {}
+        self.dumps = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        """Start sampling the calling thread, which should be the event loop thread"""
+        if self._thread is not None:
+            return
+        self._target = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._samples.clear()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self._samples.append((time.perf_counter(), ";".join(reversed(stack))))
+
+    def folded(self, started: float, finished: float) -> Counter:
+        return Counter(stack for at, stack in list(self._samples) if started <= at <= finished)
+
+    def dump(self, label: str, started: float, finished: float) -> Optional[str]:
+        """Write the stacks sampled between started and finished; at most one file per label per cooldown"""
+        now = time.monotonic()
+        if now - self._last_dump.get(label, -PROFILE_COOLDOWN) < PROFILE_COOLDOWN:
+            return None
+        stacks = self.folded(started, finished)
+        if not stacks:
+            return None
+        self._last_dump[label] = now
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_") or "root"
+        path = os.path.join(PROFILE_DIR, f"{int(time.time() * 1000)}-{slug}.folded")
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self.dumps += 1
+        return path
+
+profiler = SamplingProfiler()
+
+_instrumented = weakref.WeakSet()
+
+def instrument_engine(engine):
+    """Attribute statement counts, cursor time and slow statements to the current request"""
+    # Each app startup instruments the engines again; listen once per engine
+    if engine.sync_engine in _instrumented:
+        return
+    _instrumented.add(engine.sync_engine)
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        stats = _current.get() or _background
+        stats.statements += 1
+        stats.db_time += elapsed
+        if elapsed * 1000 >= SLOW_QUERY_MS and stats is not _background:
+            stats.slow_queries.append((" ".join(statement.split())[:500], elapsed))
+
+class InstrumentationMiddleware:
+    """ASGI middleware recording per-route totals and profiling slow requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            finished = time.perf_counter()
+            _current.reset(token)
+            # Route templates keep label cardinality bounded
+            route = scope.get("route")
+            label = route.path if route is not None else "unmatched"
+            registry.observe(scope["method"], label, status, finished - started, stats)
+            if profiler.running and (finished - started) * 1000 >= SLOW_REQUEST_MS:
+                profiler.dump(f"{scope['method']} {label}", started, finished)
@@ -1,18 +1,64 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from .admission import ADMISSION_CONTROL, AdmissionMiddleware, admission
+from .controllers.metrics_controller import router as metrics_router
 from .controllers.progress_controller import router as progress_router
-from .database import engine, Base
-from .models import user_progress
+from .database import get_engine, pool_status, read_replicas
+from .instrumentation import (
+    INSTRUMENTATION_ENABLED, PROFILE_SLOW_REQUESTS, InstrumentationMiddleware, instrument_engine, profiler
+)
+from .services.cache import cache
+from .services.idempotency import idempotency_index
+from .services.invalidation_bus import invalidation_bus
+from .services.progress_service import apply_published_stats, apply_queued_stats, resync_local_state
+from .services.response_cache import response_cache
+from .services.stats_writer import stats_writer, WRITE_BEHIND_ENABLED
+from .services.user_keys import user_keys
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the engines and start background workers.
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+    Startup does no database I/O: the schema is managed by Alembic
+    (`python -m app.management migrate`), and the leaderboard index warms
+    on the first read that needs it.
+    """
+    engine = get_engine()
+    # Opt-in per-route SQL and latency metrics on /metrics
+    if INSTRUMENTATION_ENABLED:
+        instrument_engine(engine)
+        for replica in read_replicas.engines:
+            instrument_engine(replica)
+    # Follow stats changes committed by the other workers
+    await invalidation_bus.start(apply_published_stats, resync_local_state)
+    if WRITE_BEHIND_ENABLED:
+        stats_writer.start(apply_queued_stats)
+    if INSTRUMENTATION_ENABLED and PROFILE_SLOW_REQUESTS:
+        profiler.start()
+    try:
+        yield
+    finally:
+        # Flush queued stats updates, then close pooled database connections
+        await stats_writer.stop()
+        await invalidation_bus.stop()
+        profiler.stop()
+        await read_replicas.dispose()
+        await engine.dispose()
 
 app = FastAPI(
     title="Shop Mini Games API",
     description="API for tracking user progress and completion times in shop mini games",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+# Shed load ahead of the handlers; added first so CORS and metrics still wrap rejections
+if ADMISSION_CONTROL:
+    app.add_middleware(AdmissionMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -22,8 +68,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if INSTRUMENTATION_ENABLED:
+    app.add_middleware(InstrumentationMiddleware)
+
 # Include routers
 app.include_router(progress_router)
+if INSTRUMENTATION_ENABLED:
+    app.include_router(metrics_router)
 
 @app.get("/")
 async def root():
@@ -31,4 +82,4 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": "2025-01-08T00:00:00Z"}
\ No newline at end of file
+    return {"status": "healthy", "timestamp": "2025-01-08T00:00:00Z", "database": pool_status(), "read_replicas": read_replicas.status(), "stats_queue": stats_writer.status(), "cache": cache.status(), "response_cache": response_cache.status(), "invalidation": invalidation_bus.status(), "idempotency": idempotency_index.status(), "user_keys": user_keys.status(), "admission": admission.status()}
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""Maintenance commands for the backend.
+
+Usage:
+    python -m app.management migrate [--revision REV]
+    python -m app.management reconcile-stats [--dry-run]
+    python -m app.management compact-progress [--before YYYY-MM-DD] [--dry-run]
+    python -m app.management rollup-stats [--rebuild] [--no-export]
+"""
+import argparse
+import asyncio
+import sys
+from datetime import date
+
+from .database import SessionLocal, get_engine
+from .schema import upgrade_schema
+from .services.analytics_service import AnalyticsService
+from .services.invalidation_bus import invalidation_bus
+from .services.progress_service import ProgressService
+from .services.progress_storage import compact_progress
+
+
+async def migrate(args) -> int:
+    """Bring the schema up to date; run before starting the API"""
+    report = await upgrade_schema(get_engine(), args.revision)
+    if report["adopted"]:
+        converted = report["user_keys"]["tables"]
+        print(f"adopted existing database at the baseline revision"
+              f"{'; converted ' + ', '.join(converted) + ' to user keys' if converted else ''}")
+        completed = report["completed"]
+        for table in completed["tables"]:
+            print(f"  created table {table}")
+        for column in completed["columns"]:
+            print(f"  added column {column}")
+        backfilled = report["backfilled"]
+        print(f"  updated user_stats for {backfilled['user_stats']} user(s)"
+              f"; rebuilt game_leaderboard with {backfilled['game_leaderboard']} row(s)")
+    print(f"schema at {args.revision}")
+    return 0
+
+
+async def reconcile_stats(args) -> int:
+    """Rebuild user_stats counters from user_progress and report drift"""
+    async with SessionLocal() as db:
+        drift = await ProgressService(db).reconcile_user_stats(dry_run=args.dry_run)
+
+    for entry in drift:
+        print(f"{entry['user_id']}:")
+        for field, (stored, expected) in entry["fields"].items():
+            print(f"  {field}: {stored!r} -> {expected!r}")
+
+    action = "would be updated" if args.dry_run else "updated"
+    print(f"{len(drift)} user(s) drifted, {action}")
+    return 0
+
+
+async def compact(args) -> int:
+    """Roll raw games older than the retention window into daily summaries"""
+    async with SessionLocal() as db:
+        report = await compact_progress(db, before=args.before, dry_run=args.dry_run)
+
+    action = "would be compacted" if args.dry_run else "compacted"
+    print(f"{report['rows']} game(s) before {report['cutoff']} {action}")
+    for name in report["partitions_dropped"]:
+        print(f"  dropped partition {name}")
+    return 0
+
+
+async def rollup(args) -> int:
+    """Materialize per-day completion-time distributions and export them as Parquet"""
+    async with SessionLocal() as db:
+        service = AnalyticsService(db)
+        report = await service.rollup_daily_stats(rebuild=args.rebuild)
+        print(f"user_progress ids {report['from_id']}..{report['to_id']}: "
+              f"{report['days']} game day(s) recomputed, {report['skipped_days']} compacted day(s) skipped")
+        if not args.no_export:
+            try:
+                print(f"exported {await service.export_parquet()}")
+            except RuntimeError as e:
+                print(f"export skipped: {e}", file=sys.stderr)
+                return 1
+    return 0
+
+
+async def run(args) -> int:
+    try:
+        return await args.func(args)
+    finally:
+        await invalidation_bus.stop()
+        await get_engine().dispose()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.management")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    upgrade = commands.add_parser("migrate", help="Apply Alembic migrations and create upcoming partitions")
+    upgrade.add_argument("--revision", default="head", help="Target revision (default: head)")
+    upgrade.set_defaults(func=migrate)
+
+    reconcile = commands.add_parser("reconcile-stats", help="Rebuild user_stats counters from history")
+    reconcile.add_argument("--dry-run", action="store_true", help="Report drift without writing fixes")
+    reconcile.set_defaults(func=reconcile_stats)
+
+    compaction = commands.add_parser("compact-progress", help="Fold old games into per-user daily summaries")
+    compaction.add_argument("--before", type=date.fromisoformat,
+                            help="Compact games before this day (default: PROGRESS_RETENTION_MONTHS full months back)")
+    compaction.add_argument("--dry-run", action="store_true", help="Count games without compacting them")
+    compaction.set_defaults(func=compact)
+
+    rollup_stats = commands.add_parser("rollup-stats", help="Materialize daily completion-time distributions")
+    rollup_stats.add_argument("--rebuild", action="store_true", help="Recompute every day, ignoring the watermark")
+    rollup_stats.add_argument("--no-export", action="store_true", help="Skip writing the Parquet file")
+    rollup_stats.set_defaults(func=rollup)
+
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, Float, JSON, UniqueConstraint
+from sqlalchemy.sql import func
+from ..database import Base
+
+class GameDailyStats(Base):
+    """Materialized completion-time distribution for one game type on one day.
+
+    Written by `python -m app.management rollup-stats`. Histogram bucket i
+    counts times in [edges[i], edges[i + 1]); the last bucket is open-ended.
+    """
+    __tablename__ = "game_daily_stats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    game_type = Column(String, nullable=False)
+    day = Column(Date, nullable=False)
+    games_played = Column(Integer, default=0)
+    players = Column(Integer, default=0)
+    completed_games = Column(Integer, default=0)
+    total_completion_time = Column(Float, default=0.0)
+    min_time = Column(Float, nullable=True)
+    max_time = Column(Float, nullable=True)
+    mean_time = Column(Float, nullable=True)
+    p50_time = Column(Float, nullable=True)
+    p90_time = Column(Float, nullable=True)
+    p95_time = Column(Float, nullable=True)
+    p99_time = Column(Float, nullable=True)
+    histogram_edges = Column(JSON, nullable=False)
+    histogram_counts = Column(JSON, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint('game_type', 'day', name='uq_game_daily_stats_game_day'),
+    )
+
+class RollupWatermark(Base):
+    """Highest user_progress id already folded into a rollup"""
+    __tablename__ = "rollup_watermarks"
+    
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
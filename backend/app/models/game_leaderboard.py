@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from ..database import Base
+
+class GameLeaderboardEntry(Base):
+    """Per-user rollup for one game type over one period.
+
+    `period` is "day:YYYY-MM-DD", "week:YYYY-MM-DD" (the Monday the week
+    starts on) or "all", so daily, weekly and all-time boards share a table.
+    """
+    __tablename__ = "game_leaderboard"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    game_type = Column(String, nullable=False)
+    period = Column(String, nullable=False)
+    user_id = Column(String, nullable=False)
+    games_played = Column(Integer, default=0)
+    best_time = Column(Float, nullable=False)
+    total_completion_time = Column(Float, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint('game_type', 'period', 'user_id', name='uq_game_period_user'),
+        # Ranking within a board reads this index in order and stops at the limit
+        Index('idx_game_period_best_time', 'game_type', 'period', 'best_time', 'user_id'),
+    )
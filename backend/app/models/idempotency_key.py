@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from ..database import Base
+
+class IdempotencyKey(Base):
+    """Client-supplied key of a submission, and the user_progress row it created.
+
+    Kept in its own table because a unique constraint on a partitioned
+    user_progress would have to include game_date. The primary key makes a
+    key usable once per user.
+    """
+    __tablename__ = "idempotency_keys"
+    
+    user_id = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    progress_id = Column(Integer, nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
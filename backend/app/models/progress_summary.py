@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey, UniqueConstraint
+from ..database import Base
+
+class DailyProgressSummary(Base):
+    """Compacted user_progress: one row per user, day and game type.
+
+    Raw rows older than the retention window are folded in here by
+    `python -m app.management compact-progress` and then removed.
+    """
+    __tablename__ = "user_progress_daily"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_key = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    game_type = Column(String, nullable=False)
+    games_played = Column(Integer, default=0)
+    best_time = Column(Float, nullable=False)
+    total_completion_time = Column(Float, default=0.0)
+    total_score = Column(Integer, default=0)
+    total_lives_remaining = Column(Integer, default=0)
+    completed_games = Column(Integer, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint('user_key', 'day', 'game_type', name='uq_progress_daily_user_key_day_game'),
+    )
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from ..database import Base
+
+class User(Base):
+    """Compact integer key for each external user id.
+
+    Fact tables store `user_key` instead of repeating the id string in
+    every row and index entry. Keys never change once assigned.
+    """
+    __tablename__ = "users"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    external_id = Column(String, unique=True, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
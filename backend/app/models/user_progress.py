@@ -1,13 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, Index
+from sqlalchemy import Column, Integer, String, DateTime, Date, Float, Boolean, ForeignKey, Index
 from sqlalchemy.sql import func
-from ..database import Base
+from ..database import Base, PARTITION_PROGRESS
 
 class UserProgress(Base):
     __tablename__ = "user_progress"
     
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, nullable=False, index=True)
-    game_date = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_key = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # A partitioned table's primary key has to include the partition key
+    game_date = Column(DateTime(timezone=True), server_default=func.now(), index=True,
+                       primary_key=PARTITION_PROGRESS)
     completion_time = Column(Float, nullable=False)  # in seconds
     score = Column(Integer, default=0)
     completed = Column(Boolean, default=True)
@@ -16,10 +18,15 @@ class UserProgress(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
+    # External id of rows created on the request path; not a column, rows store user_key
+    user_id = None
+    
     # Composite index for efficient queries
     __table_args__ = (
-        Index('idx_user_date', 'user_id', 'game_date'),
-        Index('idx_user_completion_time', 'user_id', 'completion_time'),
+        Index('idx_user_date', 'user_key', 'game_date'),
+        Index('idx_user_completion_time', 'user_key', 'completion_time'),
+        Index('idx_game_type_user', 'game_type', 'user_key'),
+        {'postgresql_partition_by': 'RANGE (game_date)'} if PARTITION_PROGRESS else {},
     )
 
 class UserStats(Base):
@@ -27,6 +34,7 @@ class UserStats(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, unique=True, nullable=False, index=True)
+    user_key = Column(Integer, ForeignKey("users.id"), nullable=False)
     total_games_played = Column(Integer, default=0)
     best_time = Column(Float, nullable=True)  # fastest completion time
     average_time = Column(Float, nullable=True)
@@ -35,5 +43,16 @@ class UserStats(Base):
     current_streak = Column(Integer, default=0)  # consecutive days played
     longest_streak = Column(Integer, default=0)
     last_played = Column(DateTime(timezone=True), nullable=True)
+    last_played_date = Column(Date, nullable=True)  # day of last game, drives streaks
+    # Running totals so averages can be maintained without rescanning user_progress
+    total_completion_time = Column(Float, default=0.0)
+    total_lives_remaining = Column(Integer, default=0)
+    completed_games = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Supports ranked leaderboard queries ordered by (best_time, user_id)
+    __table_args__ = (
+        Index('idx_user_stats_best_time', 'best_time', 'user_id'),
+        Index('uq_user_stats_user_key', 'user_key', unique=True),
+    )
\ No newline at end of file
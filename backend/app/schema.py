@@ -0,0 +1,86 @@
+import asyncio
+import os
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+from .database import Base, SessionLocal
+# Register every table on Base.metadata so adoption can tell which are missing
+from .models import game_daily_stats, game_leaderboard, idempotency_key, progress_summary, user, user_progress  # noqa: F401
+from .services.game_leaderboard_service import GameLeaderboardService
+from .services.progress_service import ProgressService
+from .services.progress_storage import ensure_partitions
+from .services.user_keys import migrate_user_keys
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+BASELINE_REVISION = "0001"  # the schema create_all built before migrations existed
+
+def alembic_config() -> Config:
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "migrations"))
+    return config
+
+def _tables(conn) -> set:
+    return set(inspect(conn).get_table_names())
+
+def _complete_schema(conn) -> dict:
+    """Create the tables, columns and indexes the baseline revision has and `conn`'s database lacks.
+
+    Older create_all builds predate some tables and the running-total
+    columns on user_stats. Added columns are nullable and start empty
+    until the backfill.
+    """
+    tables = _tables(conn)
+    report = {"tables": [], "columns": []}
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            table.create(conn)
+            report["tables"].append(table.name)
+            continue
+        existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                conn.execute(text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(conn.dialect)}"
+                ))
+                report["columns"].append(f"{table.name}.{column.name}")
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    return report
+
+async def _backfill() -> dict:
+    """Rebuild user_stats and game_leaderboard from the games already in user_progress"""
+    async with SessionLocal() as db:
+        drift = await ProgressService(db).reconcile_user_stats()
+        rows = await GameLeaderboardService(db).rebuild()
+        await db.commit()
+    return {"user_stats": len(drift), "game_leaderboard": rows}
+
+async def upgrade_schema(engine, revision: str = "head") -> dict:
+    """Run Alembic migrations up to `revision`, then create upcoming partitions.
+
+    A database built by the old startup create_all has tables but no
+    alembic_version. It is brought to the baseline schema before being
+    stamped there: user ids become integer keys, missing tables and
+    columns are added, and user_stats and game_leaderboard are rebuilt
+    from the games. Stamping comes last, so an adoption that fails part
+    way is simply run again. game_daily_stats fills on the next
+    rollup-stats run.
+    """
+    async with engine.connect() as conn:
+        tables = await conn.run_sync(_tables)
+    report = {"adopted": False, "user_keys": None, "completed": None, "backfilled": None}
+    config = alembic_config()
+
+    # Alembic's env.py runs its own event loop, so commands go to a worker thread
+    if "alembic_version" not in tables and "user_progress" in tables:
+        report["user_keys"] = await migrate_user_keys(engine)
+        async with engine.begin() as conn:
+            report["completed"] = await conn.run_sync(_complete_schema)
+        report["backfilled"] = await _backfill()
+        await asyncio.to_thread(command.stamp, config, BASELINE_REVISION)
+        report["adopted"] = True
+    await asyncio.to_thread(command.upgrade, config, revision)
+
+    async with engine.begin() as conn:
+        await ensure_partitions(conn)
+    return report
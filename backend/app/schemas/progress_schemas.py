@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field
-from datetime import datetime
-from typing import Optional, List
+from pydantic import BaseModel, Field, field_validator
+from datetime import date, datetime
+from typing import Any, Dict, Optional, List
 
 class ProgressCreate(BaseModel):
     user_id: str = Field(..., min_length=1, max_length=100)
@@ -9,6 +9,16 @@ class ProgressCreate(BaseModel):
     completed: bool = Field(default=True)
     lives_remaining: Optional[int] = Field(default=3, ge=0, le=5, description="Lives remaining after completion")
     game_type: Optional[str] = Field(default="connections", description="Type of game played")
+    idempotency_key: Optional[str] = Field(
+        default=None, min_length=1, max_length=255,
+        description="Retries with the same key return the original entry; the Idempotency-Key header takes precedence"
+    )
+
+    @field_validator("score", "lives_remaining", "game_type", mode="before")
+    @classmethod
+    def default_when_null(cls, value, info):
+        # An explicit null has always been stored as the column default; totals and averages count it the same way
+        return cls.model_fields[info.field_name].default if value is None else value
 
 class ProgressResponse(BaseModel):
     id: int
@@ -24,6 +34,25 @@ class ProgressResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ProgressBatchCreate(BaseModel):
+    # Items are validated one by one so a bad entry fails alone, not the whole batch
+    items: List[Dict[str, Any]] = Field(..., min_length=1, max_length=1000)
+
+class ProgressBatchItemResult(BaseModel):
+    index: int
+    status: str  # "created" or "error"
+    progress: Optional[ProgressResponse] = None
+    error: Optional[str] = None
+
+class ProgressBatchResponse(BaseModel):
+    results: List[ProgressBatchItemResult]
+    created: int
+    failed: int
+
+class ProgressPageResponse(BaseModel):
+    entries: List[ProgressResponse]
+    next_cursor: Optional[str] = None
+
 class UserStatsResponse(BaseModel):
     user_id: str
     total_games_played: int
@@ -72,4 +101,49 @@ class MockLeaderboardEntry(BaseModel):
 class MockLeaderboardResponse(BaseModel):
     entries: List[MockLeaderboardEntry]
     your_rank: Optional[int] = None
-    total_players: int
\ No newline at end of file
+    total_players: int
+
+class RankedEntry(BaseModel):
+    rank: int
+    user_id: str
+    best_time: float
+    total_games: int
+    average_time: float
+
+class UserRankResponse(BaseModel):
+    user_id: str
+    rank: int
+    total_players: int
+    neighbors: List[RankedEntry]
+
+class GameLeaderboardResponse(BaseModel):
+    game_type: str
+    period: str
+    entries: List[RankedEntry]
+    total_players: int
+
+class HistogramResponse(BaseModel):
+    bucket_edges: List[float]
+    counts: List[int]
+
+class DailyDistribution(BaseModel):
+    day: date
+    games_played: int
+    players: int
+    completed_games: int
+    min_time: Optional[float]
+    max_time: Optional[float]
+    mean_time: Optional[float]
+    p50_time: Optional[float]
+    p90_time: Optional[float]
+    p95_time: Optional[float]
+    p99_time: Optional[float]
+    histogram: HistogramResponse
+
+class GameDistributionResponse(BaseModel):
+    game_type: str
+    start_date: str
+    end_date: str
+    games_played: int
+    days: List[DailyDistribution]
+    histogram: Optional[HistogramResponse] = None
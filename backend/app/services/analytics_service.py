@@ -0,0 +1,188 @@
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import select, func, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.game_daily_stats import GameDailyStats, RollupWatermark
+from ..models.user_progress import UserProgress
+from .progress_storage import retention_cutoff
+
+ANALYTICS_EXPORT_DIR = os.getenv("ANALYTICS_EXPORT_DIR", "./analytics")
+HISTOGRAM_BUCKET_SECONDS = float(os.getenv("HISTOGRAM_BUCKET_SECONDS", "10"))
+HISTOGRAM_MAX_SECONDS = float(os.getenv("HISTOGRAM_MAX_SECONDS", "300"))
+# Rows younger than this may sit behind a lower id that has not committed yet
+ROLLUP_SETTLE_SECONDS = 60
+WATERMARK = "game_daily_stats"
+
+STATS_COLUMNS = [
+    "games_played", "players", "completed_games", "total_completion_time", "min_time", "max_time",
+    "mean_time", "p50_time", "p90_time", "p95_time", "p99_time", "histogram_edges", "histogram_counts"
+]
+
+def _as_date(value) -> date:
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def summarize(user_keys: List[int], times: List[float], completed: List[bool], edges) -> dict:
+    """Distribution of one game type's completion times on one day"""
+    import numpy as np
+
+    values = np.asarray(times, dtype=np.float64)
+    p50, p90, p95, p99 = np.percentile(values, [50, 90, 95, 99])
+    counts, _ = np.histogram(values, bins=np.append(edges, np.inf))
+    return {
+        "games_played": int(values.size),
+        "players": len(set(user_keys)),
+        "completed_games": int(np.count_nonzero(completed)),
+        "total_completion_time": float(values.sum()),
+        "min_time": float(values.min()),
+        "max_time": float(values.max()),
+        "mean_time": float(values.mean()),
+        "p50_time": float(p50),
+        "p90_time": float(p90),
+        "p95_time": float(p95),
+        "p99_time": float(p99),
+        "histogram_edges": edges.tolist(),
+        "histogram_counts": counts.tolist()
+    }
+
+class AnalyticsService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def rollup_daily_stats(self, rebuild: bool = False) -> dict:
+        """Recompute game_daily_stats for every (game type, day) with rows past the watermark.
+
+        Percentiles can't be merged, so each touched day is recomputed from
+        all of its raw rows; untouched days are never read. Days already
+        compacted into daily summaries keep their materialized rows.
+        """
+        import numpy as np
+
+        watermark = await self.db.get(RollupWatermark, WATERMARK)
+        if watermark is None:
+            watermark = RollupWatermark(name=WATERMARK, last_id=0)
+            self.db.add(watermark)
+        last_id = 0 if rebuild else watermark.last_id
+
+        settled = datetime.utcnow() - timedelta(seconds=ROLLUP_SETTLE_SECONDS)
+        upper = await self.db.scalar(
+            select(func.max(UserProgress.id)).where(UserProgress.id > last_id, UserProgress.created_at < settled)
+        )
+        report = {"from_id": last_id, "to_id": upper or last_id, "days": 0, "skipped_days": 0}
+        if upper is None:
+            await self.db.commit()
+            return report
+
+        touched = defaultdict(set)
+        for game_type, day in await self.db.execute(
+            select(UserProgress.game_type, func.date(UserProgress.game_date))
+            .where(UserProgress.id > last_id, UserProgress.id <= upper)
+            .distinct()
+        ):
+            touched[_as_date(day)].add(game_type)
+
+        cutoff = retention_cutoff()
+        edges = np.arange(0, HISTOGRAM_MAX_SECONDS + HISTOGRAM_BUCKET_SECONDS, HISTOGRAM_BUCKET_SECONDS)
+        rows = []
+        for day, game_types in sorted(touched.items()):
+            if day < cutoff:
+                report["skipped_days"] += 1
+                continue
+            start = datetime.combine(day, datetime.min.time())
+            groups = defaultdict(lambda: ([], [], []))
+            for game_type, user_key, completion_time, completed in await self.db.execute(
+                select(UserProgress.game_type, UserProgress.user_key, UserProgress.completion_time, UserProgress.completed)
+                .where(and_(
+                    UserProgress.game_date >= start,
+                    UserProgress.game_date < start + timedelta(days=1),
+                    UserProgress.game_type.in_(game_types)
+                ))
+            ):
+                user_keys, times, completions = groups[game_type]
+                user_keys.append(user_key)
+                times.append(completion_time)
+                completions.append(bool(completed))
+            for game_type, (user_keys, times, completions) in groups.items():
+                rows.append({"game_type": game_type, "day": day, **summarize(user_keys, times, completions, edges)})
+
+        if rows:
+            insert = pg_insert if self.db.bind.dialect.name == "postgresql" else sqlite_insert
+            stmt = insert(GameDailyStats).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[GameDailyStats.game_type, GameDailyStats.day],
+                set_={**{column: stmt.excluded[column] for column in STATS_COLUMNS}, "updated_at": func.now()}
+            )
+            await self.db.execute(stmt)
+
+        watermark.last_id = upper
+        await self.db.commit()
+        report["days"] = len(rows)
+        return report
+
+    async def export_parquet(self, export_dir: str = ANALYTICS_EXPORT_DIR) -> str:
+        """Write the whole game_daily_stats table to a Parquet file for offline analysis"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet export requires the 'pyarrow' package") from e
+
+        columns = ["game_type", "day", *STATS_COLUMNS]
+        result = await self.db.execute(
+            select(*(getattr(GameDailyStats, column) for column in columns))
+            .order_by(GameDailyStats.day, GameDailyStats.game_type)
+        )
+        table = pa.Table.from_pylist([row._asdict() for row in result])
+
+        os.makedirs(export_dir, exist_ok=True)
+        path = os.path.join(export_dir, "game_daily_stats.parquet")
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        return path
+
+    async def get_distribution(self, game_type: str, start: date, end: date) -> dict:
+        """Materialized daily distributions for a game type, plus their histograms summed"""
+        result = await self.db.execute(
+            select(GameDailyStats)
+            .where(GameDailyStats.game_type == game_type, GameDailyStats.day.between(start, end))
+            .order_by(GameDailyStats.day)
+        )
+        days: List[GameDailyStats] = result.scalars().all()
+
+        # Days bucketed under different settings can't be summed with the latest ones
+        combined: Optional[Dict[str, list]] = None
+        if days:
+            edges = days[-1].histogram_edges
+            counts = [0] * len(days[-1].histogram_counts)
+            for day in days:
+                if day.histogram_edges == edges:
+                    counts = [total + count for total, count in zip(counts, day.histogram_counts)]
+            combined = {"bucket_edges": edges, "counts": counts}
+
+        return {
+            "game_type": game_type,
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+            "games_played": sum(day.games_played for day in days),
+            "days": [
+                {
+                    "day": day.day,
+                    "games_played": day.games_played,
+                    "players": day.players,
+                    "completed_games": day.completed_games,
+                    "min_time": day.min_time,
+                    "max_time": day.max_time,
+                    "mean_time": day.mean_time,
+                    "p50_time": day.p50_time,
+                    "p90_time": day.p90_time,
+                    "p95_time": day.p95_time,
+                    "p99_time": day.p99_time,
+                    "histogram": {"bucket_edges": day.histogram_edges, "counts": day.histogram_counts}
+                }
+                for day in days
+            ],
+            "histogram": combined
+        }
@@ -0,0 +1,174 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # memory or redis
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))  # seconds
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+def user_stats_key(user_id: str) -> str:
+    return f"user_stats:{user_id}"
+
+def daily_progress_key(user_id: str, day) -> str:
+    return f"daily:{user_id}:{day.isoformat()}"
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_sets = 0  # read-through sets dropped because the key was deleted meanwhile
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "stale_sets": self.stale_sets,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+class MemoryCache:
+    """Bounded in-process LRU cache with a per-entry TTL.
+
+    Values are stored as JSON-compatible objects, the same contract as
+    RedisCache, so it also stands in for Redis in development and tests.
+    Only touched from the event loop, so no locking is needed.
+
+    Read-through callers take `version(key)` before querying and pass it to
+    `set`. A delete in between bumps the key's version and the set is
+    dropped, so a read that raced a write cannot cache the old row.
+    """
+    shared = False  # each worker has its own copy to invalidate
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Sequence number of each key's latest delete; older records fold into _floor
+        self._sequence = 0
+        self._deleted: "OrderedDict[str, int]" = OrderedDict()
+        self._floor = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry[1]
+
+    async def version(self, key: str) -> int:
+        return self._sequence
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, version: Optional[int] = None):
+        if version is not None and self._deleted.get(key, self._floor) > version:
+            self.stats.stale_sets += 1
+            return
+        self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def delete(self, *keys: str):
+        self._sequence += 1
+        for key in keys:
+            if self._entries.pop(key, None) is not None:
+                self.stats.invalidations += 1
+            self._deleted[key] = self._sequence
+            self._deleted.move_to_end(key)
+        while len(self._deleted) > self.max_entries:
+            self._floor = max(self._floor, self._deleted.popitem(last=False)[1])
+
+    async def clear(self):
+        self._entries.clear()
+        self._sequence += 1
+        self._deleted.clear()
+        self._floor = self._sequence
+
+    def status(self) -> dict:
+        return {"backend": "memory", "entries": len(self._entries), "max_entries": self.max_entries,
+                **self.stats.snapshot()}
+
+# Set KEYS[1] only while its version counter KEYS[2] still reads ARGV[3]
+_SET_IF_VERSION = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[3] then return 0 end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+return 1
+"""
+
+def _version_key(key: str) -> str:
+    return f"version:{key}"
+
+class RedisCache:
+    """Shared cache in Redis; requires the optional `redis` package.
+
+    Each deleted key gets a version counter, so read-through sets from any
+    worker are dropped if a delete landed after their read, as in MemoryCache.
+    """
+    shared = True
+
+    def __init__(self, url: str = REDIS_URL, ttl: float = CACHE_TTL):
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from e
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._client = redis_asyncio.from_url(url)
+        self._set_if_version = self._client.register_script(_SET_IF_VERSION)
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._client.get(key)
+        if raw is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return json.loads(raw)
+
+    async def version(self, key: str) -> int:
+        return int(await self._client.get(_version_key(key)) or 0)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, version: Optional[int] = None):
+        ttl_ms = int((ttl or self.ttl) * 1000)
+        if version is None:
+            await self._client.set(key, json.dumps(value), px=ttl_ms)
+        elif not await self._set_if_version(keys=[key, _version_key(key)], args=[json.dumps(value), ttl_ms, version]):
+            self.stats.stale_sets += 1
+
+    async def delete(self, *keys: str):
+        if not keys:
+            return
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.delete(*keys)
+            for key in keys:
+                # An expired counter reads as 0, which no in-flight reader holds after a bump
+                pipe.incr(_version_key(key))
+                pipe.pexpire(_version_key(key), int(self.ttl * 1000))
+            deleted, *_ = await pipe.execute()
+        self.stats.invalidations += deleted
+
+    async def clear(self):
+        await self._client.flushdb()
+
+    def status(self) -> dict:
+        # Redis evicts on its own; its eviction count lives in INFO stats
+        return {"backend": "redis", **self.stats.snapshot()}
+
+def build_cache():
+    if CACHE_BACKEND == "redis":
+        return RedisCache()
+    return MemoryCache()
+
+cache = build_cache()
@@ -0,0 +1,149 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, case, delete, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple
+from ..models.game_leaderboard import GameLeaderboardEntry
+from ..models.user import User
+from .progress_storage import progress_facts
+from .stats_delta import StatsDelta
+
+PERIODS = ("daily", "weekly", "all-time")
+
+def period_key(period: str, day: date) -> str:
+    """Rollup key for the period containing `day`"""
+    if period == "daily":
+        return f"day:{day.isoformat()}"
+    if period == "weekly":
+        return f"week:{(day - timedelta(days=day.weekday())).isoformat()}"
+    if period == "all-time":
+        return "all"
+    raise ValueError(f"Unknown period: {period}")
+
+class GameLeaderboardService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def record(self, deltas: List[StatsDelta], played_at: datetime) -> Dict[Tuple[str, str], int]:
+        """Fold games into the daily, weekly and all-time rollups with one upsert.
+        
+        Each delta covers one (user_id, game_type) pair. Returns every pair's
+        all-time games played for that game type.
+        """
+        dialect = self.db.bind.dialect.name
+        insert = pg_insert if dialect == "postgresql" else sqlite_insert
+        
+        stmt = insert(GameLeaderboardEntry).values([
+            {
+                "game_type": delta.game_type,
+                "period": period_key(period, played_at.date()),
+                "user_id": delta.user_id,
+                "games_played": delta.games,
+                "best_time": delta.best_time,
+                "total_completion_time": delta.completion_time
+            }
+            for delta in deltas
+            for period in PERIODS
+        ])
+        
+        board = GameLeaderboardEntry.__table__.c
+        new = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[board.game_type, board.period, board.user_id],
+            set_={
+                "games_played": board.games_played + new.games_played,
+                "best_time": case((new.best_time < board.best_time, new.best_time), else_=board.best_time),
+                "total_completion_time": board.total_completion_time + new.total_completion_time,
+                "updated_at": func.now()
+            }
+        ).returning(
+            GameLeaderboardEntry.user_id,
+            GameLeaderboardEntry.game_type,
+            GameLeaderboardEntry.period,
+            GameLeaderboardEntry.games_played
+        )
+        
+        result = await self.db.execute(stmt)
+        return {
+            (user_id, game_type): games_played
+            for user_id, game_type, key, games_played in result
+            if key == "all"
+        }
+    
+    async def rebuild(self, chunk_rows: int = 1000) -> int:
+        """Recompute every board from user_progress and its daily summaries; returns the rows written.
+        
+        Reads one grouped row per user, game type and day, so it runs in a
+        single pass however many games are behind it. Commits nothing.
+        """
+        facts = progress_facts(summary_filter=())
+        result = await self.db.stream(
+            select(
+                User.external_id,
+                facts.c.game_type,
+                facts.c.day,
+                func.sum(facts.c.games),
+                func.min(facts.c.best_time),
+                func.coalesce(func.sum(facts.c.total_time), 0.0)
+            )
+            .join(User, User.id == facts.c.user_key)
+            .where(facts.c.game_type.is_not(None))
+            .group_by(User.external_id, facts.c.game_type, facts.c.day)
+        )
+        
+        boards = {}
+        async for user_id, game_type, day, games, best_time, total_time in result:
+            if isinstance(day, str):
+                day = date.fromisoformat(day)
+            for period in PERIODS:
+                key = (game_type, period_key(period, day), user_id)
+                entry = boards.get(key)
+                if entry is None:
+                    boards[key] = [games, best_time, total_time]
+                else:
+                    entry[0] += games
+                    entry[1] = min(entry[1], best_time)
+                    entry[2] += total_time
+        
+        await self.db.execute(delete(GameLeaderboardEntry))
+        rows = [
+            {
+                "game_type": game_type,
+                "period": key,
+                "user_id": user_id,
+                "games_played": games,
+                "best_time": best_time,
+                "total_completion_time": total_time
+            }
+            for (game_type, key, user_id), (games, best_time, total_time) in boards.items()
+        ]
+        for start in range(0, len(rows), chunk_rows):
+            await self.db.execute(insert(GameLeaderboardEntry), rows[start:start + chunk_rows])
+        return len(rows)
+    
+    async def get_leaderboard(self, game_type: str, period: str, day: date, limit: int = 10):
+        """Top players for one game type and period, plus the number of ranked players"""
+        key = period_key(period, day)
+        in_board = (GameLeaderboardEntry.game_type == game_type, GameLeaderboardEntry.period == key)
+        
+        result = await self.db.execute(
+            select(
+                GameLeaderboardEntry.user_id,
+                GameLeaderboardEntry.best_time,
+                GameLeaderboardEntry.games_played,
+                GameLeaderboardEntry.total_completion_time
+            )
+            .where(*in_board)
+            .order_by(GameLeaderboardEntry.best_time, GameLeaderboardEntry.user_id)
+            .limit(limit)
+        )
+        entries = result.all()
+        total_players = await self.db.scalar(select(func.count(GameLeaderboardEntry.id)).where(*in_board)) or 0
+        
+        return {
+            "game_type": game_type,
+            "period": key,
+            "entries": entries,
+            "total_players": total_players
+        }
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from sqlalchemy import select, func, literal, union_all
+from .progress_storage import progress_facts
+from .response_cache import data_version
+
+GAME_STATS_TTL = float(os.getenv("GAME_STATS_CACHE_TTL", "300"))  # seconds between full reloads
+
+@dataclass
+class GameTotals:
+    games: int = 0
+    players: int = 0
+    total_time: float = 0.0
+    total_lives: int = 0
+    completed: int = 0
+
+    def as_stats(self) -> dict:
+        """Shape used by GameStatsResponse"""
+        if self.games == 0:
+            return {
+                "total_players": 0,
+                "average_completion_time": 0.0,
+                "average_lives_remaining": 0.0,
+                "total_games_played": 0,
+                "completion_rate": 0.0
+            }
+        return {
+            "total_players": self.players,
+            "average_completion_time": round(self.total_time / self.games, 2),
+            "average_lives_remaining": round(self.total_lives / self.games, 2),
+            "total_games_played": self.games,
+            "completion_rate": round((self.completed / self.games) * 100, 2)
+        }
+
+class GameStatsCache:
+    """Global and per-game-type totals, loaded with one grouped query.
+
+    Submissions are folded in incrementally, and the whole cache is reloaded
+    once it is older than GAME_STATS_TTL. Writes committed by other workers
+    arrive over the invalidation bus when one is configured, and otherwise
+    show up within one TTL.
+    """
+
+    def __init__(self, ttl: float = GAME_STATS_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self._overall: Optional[GameTotals] = None
+        self._by_game: Dict[str, GameTotals] = {}
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_fresh(self) -> bool:
+        return self._overall is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    async def overall(self, db) -> dict:
+        await self._ensure_loaded(db)
+        return self._overall.as_stats()
+
+    async def for_game(self, db, game_type: str) -> dict:
+        await self._ensure_loaded(db)
+        return self._by_game.get(game_type, GameTotals()).as_stats()
+
+    def record(self, game_type: str, games: int, completion_time: float, lives_remaining: int,
+               completed_games: int, new_player: bool, new_game_player: bool):
+        """Fold committed games into the cached totals"""
+        if self._overall is None:
+            return
+        for totals in (self._overall, self._by_game.setdefault(game_type, GameTotals())):
+            totals.games += games
+            totals.total_time += completion_time
+            totals.total_lives += lives_remaining
+            totals.completed += completed_games
+        if new_player:
+            self._overall.players += 1
+        if new_game_player:
+            self._by_game[game_type].players += 1
+        self.version += 1
+
+    def invalidate(self):
+        self._loaded_at = 0.0
+
+    async def _ensure_loaded(self, db):
+        if self.is_fresh:
+            return
+        async with self._lock:
+            if not self.is_fresh:
+                await self.load(db)
+
+    async def load(self, db):
+        """Reload every total in one statement: a row per game type plus an overall row.
+        
+        Totals cover raw games and compacted daily summaries alike.
+        """
+        facts = progress_facts(summary_filter=())
+        metrics = (
+            func.coalesce(func.sum(facts.c.games), 0),
+            func.count(func.distinct(facts.c.user_key)),
+            func.coalesce(func.sum(facts.c.total_time), 0.0),
+            func.coalesce(func.sum(facts.c.total_lives), 0),
+            func.coalesce(func.sum(facts.c.completed), 0)
+        )
+        per_game = select(literal("game").label("scope"), facts.c.game_type, *metrics)\
+            .group_by(facts.c.game_type)
+        overall = select(literal("all").label("scope"), literal(None).label("game_type"), *metrics)
+
+        rows = (await db.execute(union_all(per_game, overall))).all()
+
+        by_game = {}
+        overall_totals = GameTotals()
+        for scope, game_type, *values in rows:
+            if scope == "all":
+                overall_totals = GameTotals(*values)
+            else:
+                by_game[game_type] = GameTotals(*values)
+
+        # A reload that finds what was already folded in keeps every client's ETag valid
+        changed = self._rendered() != self._rendered(overall_totals, by_game)
+        self._overall = overall_totals
+        self._by_game = by_game
+        self._loaded_at = time.monotonic()
+        if changed:
+            self.version += 1
+            data_version.bump()
+
+    def _rendered(self, overall: Optional[GameTotals] = None, by_game: Optional[Dict[str, GameTotals]] = None):
+        """The stats as responses show them, rounded, so float drift between folds and SUM doesn't count"""
+        if overall is None:
+            overall, by_game = self._overall, self._by_game
+        if overall is None:
+            return None
+        return overall.as_stats(), {game_type: totals.as_stats() for game_type, totals in by_game.items()}
+
+game_stats_cache = GameStatsCache()
@@ -0,0 +1,50 @@
+import os
+from collections import OrderedDict
+from typing import Optional
+from ..schemas.progress_schemas import ProgressResponse
+
+IDEMPOTENCY_CACHE_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_CACHE_MAX_ENTRIES", "10000"))
+
+class IdempotencyIndex:
+    """Recently used (user_id, idempotency key) pairs and the response each one produced.
+
+    Retries usually arrive within seconds, so a bounded LRU answers most of
+    them without a query. The idempotency_keys table stays the source of
+    truth for anything evicted or recorded by another worker.
+    """
+
+    def __init__(self, max_entries: int = IDEMPOTENCY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._responses: "OrderedDict[tuple, ProgressResponse]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.db_hits = 0
+        self.evictions = 0
+
+    def get(self, user_id: str, key: str) -> Optional[ProgressResponse]:
+        response = self._responses.get((user_id, key))
+        if response is None:
+            self.misses += 1
+            return None
+        self._responses.move_to_end((user_id, key))
+        self.hits += 1
+        return response
+
+    def set(self, user_id: str, key: str, response: ProgressResponse):
+        self._responses[(user_id, key)] = response
+        self._responses.move_to_end((user_id, key))
+        while len(self._responses) > self.max_entries:
+            self._responses.popitem(last=False)
+            self.evictions += 1
+
+    def status(self) -> dict:
+        return {
+            "entries": len(self._responses),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "db_hits": self.db_hits,
+            "evictions": self.evictions
+        }
+
+idempotency_index = IdempotencyIndex()
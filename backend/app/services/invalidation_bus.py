@@ -0,0 +1,312 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+import orjson
+from ..database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_BUS = os.getenv("INVALIDATION_BUS", "none")  # none, memory, file or postgres
+INVALIDATION_CHANNEL = os.getenv("INVALIDATION_CHANNEL", "progress_invalidation")
+INVALIDATION_FILE = os.getenv("INVALIDATION_FILE", "./invalidation.log")
+INVALIDATION_POLL_MS = float(os.getenv("INVALIDATION_POLL_MS", "50"))  # file backend only
+RECONNECT_DELAY = 1.0  # seconds, doubled up to 30 while Postgres is unreachable
+MAX_PAYLOAD = 7900  # NOTIFY payloads must stay under 8000 bytes
+
+Handler = Callable[[dict], Awaitable[None]]
+Resync = Callable[[], Awaitable[None]]
+
+class DeliveryLag:
+    """Seconds between a peer publishing a change and this worker applying it"""
+
+    def __init__(self, window: int = 1000):
+        self._recent = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        seconds = max(seconds, 0.0)
+        self._recent.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def snapshot(self) -> dict:
+        recent = sorted(self._recent)
+        return {
+            "last": round(self._recent[-1], 6) if recent else None,
+            "mean": round(self.total / self.count, 6) if self.count else None,
+            "p99": round(recent[min(len(recent) - 1, int(len(recent) * 0.99))], 6) if recent else None,
+            "max": round(self.max, 6)
+        }
+
+def split_message(message: dict) -> Optional[tuple]:
+    """Two messages that each carry half of every list field, or None if nothing is left to split"""
+    if not any(isinstance(value, list) and len(value) > 1 for value in message.values()):
+        return None
+    first, second = {}, {}
+    for field, value in message.items():
+        if isinstance(value, list):
+            first[field], second[field] = value[:len(value) // 2], value[len(value) // 2:]
+        else:
+            first[field] = second[field] = value
+    return first, second
+
+class InvalidationBus:
+    """Fans committed changes out to every worker so per-process state stays in step.
+
+    Each message carries the publishing worker's id and a sequence number.
+    Workers skip their own messages, apply everyone else's, and run a full
+    resync when they may have missed some: after a (re)connect or a gap in a
+    peer's sequence. Subclasses only move bytes.
+    """
+    backend = "none"
+
+    def __init__(self):
+        self.origin = os.urandom(6).hex()
+        self.lag = DeliveryLag()
+        self.connected = False
+        self.published = 0
+        self.received = 0
+        self.resyncs = 0
+        self.stale_rows = 0  # leaderboard rows older than the worker's copy, dropped on apply
+        self._seq = 0
+        self._peers: Dict[str, int] = {}
+        self._handler: Optional[Handler] = None
+        self._resync: Optional[Resync] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: Handler, resync: Resync):
+        self._handler = handler
+        self._resync = resync
+        self._task = asyncio.get_running_loop().create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._close()
+        self.connected = False
+
+    async def publish(self, message: dict):
+        """Send a change to the other workers.
+
+        Messages too large for one notification are split: every list field
+        holds independent entries (users, games, keys), so halves can be
+        applied separately. A message that can't be split asks for a resync.
+        """
+        if self.backend == "none":
+            return
+        sent_at = time.time()
+        payload = orjson.dumps({"origin": self.origin, "seq": self._seq + 1, "sent_at": sent_at, **message})
+        if len(payload) > MAX_PAYLOAD:
+            halves = split_message(message)
+            if halves is not None:
+                for half in halves:
+                    await self.publish(half)
+                return
+            payload = orjson.dumps({"origin": self.origin, "seq": self._seq + 1, "sent_at": sent_at, "resync": True})
+        self._seq += 1
+        try:
+            await self._send(payload.decode())
+            self.published += 1
+        except Exception:
+            # Peers see the sequence gap on our next message and resync
+            logger.exception("Failed to publish invalidation")
+
+    async def _deliver(self, payload: str):
+        message = orjson.loads(payload)
+        origin = message["origin"]
+        if origin == self.origin:
+            return
+        self.received += 1
+        self.lag.observe(time.time() - message["sent_at"])
+        previous = self._peers.get(origin)
+        self._peers[origin] = message["seq"]
+        try:
+            if message.get("resync") or (previous is not None and message["seq"] != previous + 1):
+                await self.resync()
+            else:
+                await self._handler(message)
+        except Exception:
+            logger.exception("Failed to apply invalidation from %s", origin)
+            await self.resync()
+
+    async def resync(self):
+        self.resyncs += 1
+        if self._resync is not None:
+            await self._resync()
+
+    def status(self) -> dict:
+        return {
+            "backend": self.backend,
+            "connected": self.connected,
+            "published": self.published,
+            "received": self.received,
+            "resyncs": self.resyncs,
+            "stale_rows": self.stale_rows,
+            "peers": len(self._peers),
+            "lag_seconds": self.lag.snapshot()
+        }
+
+    async def _listen(self):
+        pass
+
+    async def _send(self, payload: str):
+        pass
+
+    async def _close(self):
+        pass
+
+class MemoryBus(InvalidationBus):
+    """In-process stand-in: every MemoryBus on a channel hears every other.
+
+    Lets tests and benchmarks run several "workers" inside one process.
+    """
+    backend = "memory"
+    _channels: Dict[str, List["MemoryBus"]] = {}
+
+    def __init__(self, channel: str = INVALIDATION_CHANNEL):
+        super().__init__()
+        self.channel = channel
+
+    async def _listen(self):
+        self._channels.setdefault(self.channel, []).append(self)
+        self.connected = True
+
+    async def _send(self, payload: str):
+        for bus in list(self._channels.get(self.channel, ())):
+            if bus is not self:
+                asyncio.get_running_loop().create_task(bus._deliver(payload))
+
+    async def _close(self):
+        subscribers = self._channels.get(self.channel, [])
+        if self in subscribers:
+            subscribers.remove(self)
+
+class FileBus(InvalidationBus):
+    """Workers on one host share an append-only file of JSON lines.
+
+    Each message is one O_APPEND write well under a page, so concurrent
+    writers never interleave. Readers start at the end of the file and poll
+    every INVALIDATION_POLL_MS; delete the file while all workers are
+    stopped to reclaim space.
+    """
+    backend = "file"
+
+    def __init__(self, path: str = INVALIDATION_FILE, poll_interval: float = INVALIDATION_POLL_MS / 1000):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+
+    async def _listen(self):
+        position = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        self.connected = True
+        partial = b""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                size = os.path.getsize(self.path)
+            except FileNotFoundError:
+                size = 0
+            if size < position:
+                # Truncated or replaced underneath us; what we missed is unknown
+                position, partial = 0, b""
+                await self.resync()
+            if size == position:
+                continue
+            with open(self.path, "rb") as f:
+                f.seek(position)
+                chunk = f.read(size - position)
+            position += len(chunk)
+            *lines, partial = (partial + chunk).split(b"\n")
+            for line in lines:
+                if line:
+                    await self._deliver(line.decode())
+
+    async def _send(self, payload: str):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, payload.encode() + b"\n")
+        finally:
+            os.close(fd)
+
+class PostgresBus(InvalidationBus):
+    """LISTEN/NOTIFY on a dedicated asyncpg connection outside the pool.
+
+    Postgres delivers notifications in commit order to every listening
+    session. If the connection drops, messages sent meanwhile are lost, so
+    each reconnect is followed by a resync.
+    """
+    backend = "postgres"
+
+    def __init__(self, url: str = DATABASE_URL, channel: str = INVALIDATION_CHANNEL):
+        super().__init__()
+        self.dsn = url.replace("postgresql+asyncpg://", "postgresql://", 1)
+        self.channel = channel
+        self._conn = None
+        self._send_lock = asyncio.Lock()
+
+    async def _connect(self):
+        import asyncpg
+        return await asyncpg.connect(self.dsn)
+
+    async def _listen(self):
+        delay = RECONNECT_DELAY
+        first = True
+        while True:
+            lost = asyncio.Event()
+            try:
+                conn = await self._connect()
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(self.channel, self._on_notify)
+                self._conn = conn
+                self.connected = True
+                delay = RECONNECT_DELAY
+                if not first:
+                    await self.resync()
+                first = False
+                await lost.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Invalidation listener lost its connection")
+            self.connected = False
+            self._conn = None
+            first = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        asyncio.get_running_loop().create_task(self._deliver(payload))
+
+    async def _send(self, payload: str):
+        async with self._send_lock:
+            if self._conn is None or self._conn.is_closed():
+                # Publish-only processes (management commands) never start a listener
+                self._conn = await self._connect()
+            await self._conn.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+
+    async def _close(self):
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+def build_bus() -> InvalidationBus:
+    if INVALIDATION_BUS == "postgres":
+        return PostgresBus()
+    if INVALIDATION_BUS == "file":
+        return FileBus()
+    if INVALIDATION_BUS == "memory":
+        return MemoryBus()
+    return InvalidationBus()
+
+invalidation_bus = build_bus()
@@ -0,0 +1,119 @@
+import asyncio
+from typing import Dict, List, NamedTuple, Optional
+from sortedcontainers import SortedList
+from sqlalchemy import select
+from ..models.user_progress import UserStats
+from .response_cache import data_version
+
+class RankedUser(NamedTuple):
+    """Leaderboard row; attribute names match UserStats so callers can use either"""
+    user_id: str
+    best_time: float
+    total_games_played: int
+    average_time: Optional[float]
+    average_lives_remaining: Optional[float]
+
+class LeaderboardIndex:
+    """In-process ranking of users by (best_time, user_id).
+
+    Kept current from the write path. Lookups by position and rank are
+    O(log n); until the first full load completes the index is cold and
+    callers should fall back to SQL.
+    """
+
+    def __init__(self):
+        self._order = SortedList()
+        self._users: Dict[str, RankedUser] = {}
+        self._warm = False
+        self._warming: Optional[asyncio.Task] = None
+
+    @property
+    def is_warm(self) -> bool:
+        return self._warm
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def update(self, user: RankedUser) -> bool:
+        """Insert or move a user after their stats changed; returns False if the row was ignored.
+
+        Rows are snapshots taken at commit, and overlapping submissions can
+        deliver them out of order. total_games_played only grows, so a row
+        with fewer games than the one held is older and is dropped.
+        """
+        if user.best_time is None:
+            return False
+        previous = self._users.get(user.user_id)
+        if previous is not None:
+            if user.total_games_played < previous.total_games_played:
+                return False
+            self._order.remove((previous.best_time, previous.user_id))
+        self._users[user.user_id] = user
+        self._order.add((user.best_time, user.user_id))
+        return True
+
+    def remove(self, user_id: str):
+        previous = self._users.pop(user_id, None)
+        if previous is not None:
+            self._order.remove((previous.best_time, previous.user_id))
+
+    def top(self, limit: int) -> List[RankedUser]:
+        return [self._users[user_id] for _, user_id in self._order.islice(0, limit)]
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """1-based position of the user, or None if they have no best time"""
+        user = self._users.get(user_id)
+        if user is None:
+            return None
+        return self._order.index((user.best_time, user.user_id)) + 1
+
+    def around(self, user_id: str, radius: int) -> List[tuple]:
+        """(rank, user) pairs for the user and up to `radius` players either side"""
+        rank = self.rank(user_id)
+        if rank is None:
+            return []
+        start = max(rank - 1 - radius, 0)
+        window = self._order.islice(start, rank + radius)
+        return [(start + offset + 1, self._users[uid]) for offset, (_, uid) in enumerate(window)]
+
+    def clear(self):
+        self._order.clear()
+        self._users.clear()
+        self._warm = False
+
+    async def load(self, session_factory):
+        """Fill the index from user_stats.
+
+        Users already updated from the write path while loading are newer
+        than the snapshot and are kept as they are.
+        """
+        async with session_factory() as db:
+            result = await db.stream(
+                select(
+                    UserStats.user_id,
+                    UserStats.best_time,
+                    UserStats.total_games_played,
+                    UserStats.average_time,
+                    UserStats.average_lives_remaining
+                ).where(UserStats.best_time.isnot(None))
+            )
+            async for row in result:
+                if row.user_id not in self._users:
+                    self.update(RankedUser(*row))
+        self._warm = True
+        data_version.bump()
+
+    def reload(self, session_factory):
+        """Drop everything and load again, for when updates may have been missed"""
+        if self._warming is not None and not self._warming.done():
+            self._warming.cancel()
+        self.clear()
+        self.ensure_warming(session_factory)
+
+    def ensure_warming(self, session_factory):
+        """Start loading in the background if the index is cold and not already loading"""
+        if self._warm or (self._warming is not None and not self._warming.done()):
+            return
+        self._warming = asyncio.get_running_loop().create_task(self.load(session_factory))
+
+leaderboard_index = LeaderboardIndex()
@@ -1,19 +1,144 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_
+import base64
+import csv
+import io
+import random
+import orjson
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Row, select, insert, func, desc, and_, or_, case, cast, literal, Float
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime, date, timedelta
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from ..database import SessionLocal, read_replicas
+from ..models.idempotency_key import IdempotencyKey
+from ..models.progress_summary import DailyProgressSummary
+from ..models.user import User
 from ..models.user_progress import UserProgress, UserStats
-from ..schemas.progress_schemas import ProgressCreate, UserStatsResponse, DailyProgressResponse
+from ..schemas.progress_schemas import ProgressCreate, ProgressResponse, UserStatsResponse, DailyProgressResponse
+from .cache import cache, daily_progress_key, user_stats_key
+from .game_leaderboard_service import GameLeaderboardService
+from .game_stats_cache import game_stats_cache
+from .idempotency import idempotency_index
+from .invalidation_bus import invalidation_bus
+from .leaderboard_index import RankedUser, leaderboard_index
+from .progress_storage import progress_facts, retention_cutoff
+from .response_cache import data_version
+from .stats_delta import StatsDelta
+from .stats_writer import stats_writer
+from .user_keys import user_keys
+
+# Demo names for the mock leaderboard
+MOCK_USERS = [
+    "SpeedRunner42", "GameMaster", "QuickSolver", "PuzzleKing", "FastFinisher",
+    "TimeBeater", "LifeSaver", "ProGamer", "SwiftPlayer", "ChampionSolver",
+    "RushExpert", "BlazeRunner", "NinjaPlayer", "TurboSolver", "FlashGamer"
+]
+
+# Columns behind ProgressResponse; read-only queries select these instead of
+# whole entities so rows skip the ORM identity map
+PROGRESS_FIELDS = [
+    "id", "user_id", "game_date", "completion_time", "score", "completed", "lives_remaining", "game_type", "created_at"
+]
+
+def progress_columns(user_id: str) -> tuple:
+    """PROGRESS_FIELDS for one user's rows; rows only store user_key, so the id is bound as a literal"""
+    return (
+        UserProgress.id,
+        literal(user_id).label("user_id"),
+        UserProgress.game_date,
+        UserProgress.completion_time,
+        UserProgress.score,
+        UserProgress.completed,
+        UserProgress.lives_remaining,
+        UserProgress.game_type,
+        UserProgress.created_at
+    )
+
+USER_STATS_COLUMNS = (
+    UserStats.user_id,
+    UserStats.total_games_played,
+    UserStats.best_time,
+    UserStats.average_time,
+    UserStats.average_lives_remaining,
+    UserStats.total_score,
+    UserStats.current_streak,
+    UserStats.longest_streak,
+    UserStats.last_played
+)
+
+RANKED_COLUMNS = (
+    UserStats.user_id,
+    UserStats.best_time,
+    UserStats.total_games_played,
+    UserStats.average_time,
+    UserStats.average_lives_remaining
+)
+
+def encode_cursor(entry_id: int) -> str:
+    """Opaque pagination cursor pointing at the last entry of a page"""
+    return base64.urlsafe_b64encode(f"p{entry_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> int:
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        if not raw.startswith("p"):
+            raise ValueError(raw)
+        return int(raw[1:])
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
 
 class ProgressService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
     
-    def create_progress_entry(self, progress_data: ProgressCreate) -> UserProgress:
+    async def find_submission(self, user_id: str, idempotency_key: str) -> Optional[ProgressResponse]:
+        """The entry a previous submission with this key created, if any"""
+        response = idempotency_index.get(user_id, idempotency_key)
+        if response is not None:
+            return response
+        row = (await self.db.execute(
+            select(*progress_columns(user_id))
+            .join(IdempotencyKey, IdempotencyKey.progress_id == UserProgress.id)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == idempotency_key)
+        )).first()
+        if row is None:
+            return None
+        idempotency_index.db_hits += 1
+        response = ProgressResponse.model_validate(row._asdict())
+        idempotency_index.set(user_id, idempotency_key, response)
+        return response
+    
+    async def create_idempotent_entry(
+        self, progress_data: ProgressCreate, idempotency_key: str
+    ) -> Tuple[Union[UserProgress, ProgressResponse], bool]:
+        """Create an entry once per (user, key); replays get the original back and change nothing.
+        
+        Returns the entry and whether it is a replay. Two concurrent requests
+        with the same key race on the idempotency_keys primary key; the loser
+        rolls back before its stats are committed and returns the winner's entry.
+        """
+        original = await self.find_submission(progress_data.user_id, idempotency_key)
+        if original is not None:
+            return original, True
+        try:
+            return await self.create_progress_entry(progress_data, idempotency_key), False
+        except IntegrityError:
+            await self.db.rollback()
+            original = await self.find_submission(progress_data.user_id, idempotency_key)
+            if original is None:
+                raise
+            return original, True
+    
+    async def create_progress_entry(self, progress_data: ProgressCreate,
+                                    idempotency_key: Optional[str] = None) -> UserProgress:
         """Create a new progress entry and update user stats"""
+        keys = await user_keys.resolve([progress_data.user_id])
         # Create progress entry
         db_progress = UserProgress(
             user_id=progress_data.user_id,
+            user_key=keys[progress_data.user_id],
             completion_time=progress_data.completion_time,
             score=progress_data.score,
             completed=progress_data.completed,
@@ -21,181 +146,522 @@ class ProgressService:
             game_type=progress_data.game_type
         )
         self.db.add(db_progress)
+        if idempotency_key is not None:
+            # Claim the key before any stats work; a duplicate fails here
+            await self.db.flush()
+            self.db.add(IdempotencyKey(user_id=db_progress.user_id, key=idempotency_key, progress_id=db_progress.id))
+            await self.db.flush()
+        
+        # Write-behind mode: commit the raw row now, fold stats in later
+        if stats_writer.is_running:
+            await self.db.commit()
+            await self.db.refresh(db_progress)
+            self._remember_submission(db_progress, idempotency_key)
+            await invalidate_cache(
+                daily_progress_key(db_progress.user_id, db_progress.game_date.date()), writers=[db_progress.user_id]
+            )
+            if not await stats_writer.submit(progress_data):
+                await self.apply_stats([progress_data])
+            return db_progress
         
-        # Update user stats
-        self._update_user_stats(progress_data.user_id, progress_data)
+        # Update user stats and per-game leaderboards
+        updates = await self._apply_stats([progress_data], datetime.utcnow(), keys)
         
-        self.db.commit()
-        self.db.refresh(db_progress)
+        await self.db.commit()
+        await self.db.refresh(db_progress)
+        self._remember_submission(db_progress, idempotency_key)
+        await self._publish_stats(
+            *updates, cache_keys=[daily_progress_key(db_progress.user_id, db_progress.game_date.date())]
+        )
         return db_progress
     
-    def get_user_progress(self, user_id: str, limit: int = 50) -> List[UserProgress]:
+    @staticmethod
+    def _remember_submission(db_progress: UserProgress, idempotency_key: Optional[str]):
+        if idempotency_key is not None:
+            idempotency_index.set(db_progress.user_id, idempotency_key, ProgressResponse.model_validate(db_progress))
+    
+    async def create_progress_batch(self, items: List[ProgressCreate]) -> List[UserProgress]:
+        """Insert many progress entries at once and update stats grouped by user.
+        
+        Rows go in with one bulk INSERT ... RETURNING; user_stats and the
+        game leaderboards each take one multi-row upsert, all in a single
+        transaction.
+        """
+        if not items:
+            return []
+        
+        keys = await user_keys.resolve(item.user_id for item in items)
+        result = await self.db.scalars(
+            insert(UserProgress).returning(UserProgress, sort_by_parameter_order=True),
+            [
+                {
+                    "user_key": keys[item.user_id],
+                    "completion_time": item.completion_time,
+                    "score": item.score,
+                    "completed": item.completed,
+                    "lives_remaining": item.lives_remaining,
+                    "game_type": item.game_type or "connections"
+                }
+                for item in items
+            ]
+        )
+        created = result.all()
+        for entry, item in zip(created, items):
+            entry.user_id = item.user_id
+        
+        updates = await self._apply_stats(items, datetime.utcnow(), keys)
+        await self.db.commit()
+        await self._publish_stats(
+            *updates, cache_keys={daily_progress_key(entry.user_id, entry.game_date.date()) for entry in created}
+        )
+        return created
+    
+    async def apply_stats(self, items: List[ProgressCreate], played_at: Optional[datetime] = None):
+        """Fold already-recorded games into user stats and leaderboards and commit"""
+        keys = await user_keys.resolve(item.user_id for item in items)
+        updates = await self._apply_stats(items, played_at or datetime.utcnow(), keys)
+        await self.db.commit()
+        await self._publish_stats(*updates)
+    
+    async def _apply_stats(self, items: List[ProgressCreate], played_at: datetime, keys: Dict[str, int]):
+        """Upsert user_stats and the game leaderboards inside the current transaction.
+        
+        Games are grouped so each user, and each (user, game type), gets one row.
+        """
+        user_deltas = {}
+        game_deltas = {}
+        for item in items:
+            game_type = item.game_type or "connections"
+            if item.user_id in user_deltas:
+                user_deltas[item.user_id].add(item)
+            else:
+                user_deltas[item.user_id] = StatsDelta.from_progress(item)
+            key = (item.user_id, game_type)
+            if key in game_deltas:
+                game_deltas[key].add(item)
+            else:
+                game_deltas[key] = StatsDelta.from_progress(item, game_type)
+        
+        user_deltas = list(user_deltas.values())
+        game_deltas = list(game_deltas.values())
+        ranked = await self._update_user_stats(user_deltas, played_at, keys)
+        game_games_played = await GameLeaderboardService(self.db).record(game_deltas, played_at)
+        return user_deltas, game_deltas, ranked, game_games_played
+    
+    async def _publish_stats(self, user_deltas: List[StatsDelta], game_deltas: List[StatsDelta],
+                             ranked: Dict[str, RankedUser], game_games_played: Dict[tuple, int],
+                             cache_keys: Iterable[str] = ()):
+        """Fold committed stats into the in-process leaderboard and game stats, then tell the other workers"""
+        new_users = {delta.user_id for delta in user_deltas
+                     if ranked[delta.user_id].total_games_played == delta.games}
+        games = []
+        for delta in game_deltas:
+            games.append([
+                delta.game_type,
+                delta.games,
+                delta.completion_time,
+                delta.lives_remaining,
+                delta.completed_games,
+                delta.user_id in new_users,
+                game_games_played[(delta.user_id, delta.game_type)] == delta.games
+            ])
+            new_users.discard(delta.user_id)
+        writers = [delta.user_id for delta in user_deltas]
+        keys = [user_stats_key(user_id) for user_id in writers] + list(cache_keys)
+        message = {
+            "users": [list(user) for user in ranked.values()],
+            "games": games,
+            "keys": keys,
+            "writers": writers
+        }
+        await cache.delete(*keys)
+        _fold_stats(message)
+        await invalidation_bus.publish(message)
+    
+    async def get_user_progress(self, user_id: str, limit: int = 50) -> List[Row]:
         """Get user's recent progress entries"""
-        return self.db.query(UserProgress)\
-            .filter(UserProgress.user_id == user_id)\
-            .order_by(desc(UserProgress.game_date))\
-            .limit(limit)\
-            .all()
-    
-    def get_user_stats(self, user_id: str) -> Optional[UserStats]:
-        """Get user's overall statistics"""
-        return self.db.query(UserStats)\
-            .filter(UserStats.user_id == user_id)\
-            .first()
-    
-    def get_daily_progress(self, user_id: str, target_date: date) -> DailyProgressResponse:
-        """Get user's progress for a specific day"""
+        entries, _ = await self.get_user_progress_page(user_id, limit)
+        return entries
+    
+    async def get_user_progress_page(self, user_id: str, limit: int = 50, cursor: Optional[str] = None):
+        """Get one page of a user's history, newest first, and the cursor for the next page.
+        
+        Pages are keyed on (game_date, id) so each one is an idx_user_date range
+        scan, however deep into the history it is. The cursor's game_date is
+        read back from its row rather than round-tripped through the client,
+        so comparisons use the exact stored value. Entries are plain rows with
+        the ProgressResponse fields.
+        """
+        user_key = await user_keys.lookup(self.db, user_id)
+        if user_key is None:
+            if cursor:
+                decode_cursor(cursor)
+            return [], None
+        
+        query = select(*progress_columns(user_id)).where(UserProgress.user_key == user_key)
+        if cursor:
+            entry_id = decode_cursor(cursor)
+            game_date = select(UserProgress.game_date).where(UserProgress.id == entry_id).scalar_subquery()
+            query = query.where(or_(
+                UserProgress.game_date < game_date,
+                and_(UserProgress.game_date == game_date, UserProgress.id < entry_id)
+            ))
+        
+        result = await self.db.execute(
+            query.order_by(desc(UserProgress.game_date), desc(UserProgress.id)).limit(limit + 1)
+        )
+        entries = result.all()
+        
+        next_cursor = None
+        if len(entries) > limit:
+            entries = entries[:limit]
+            # limit=0 is still allowed on /user/{user_id} and returns no entries
+            if entries:
+                next_cursor = encode_cursor(entries[-1].id)
+        return entries, next_cursor
+    
+    @staticmethod
+    async def export_user_progress(user_id: str, export_format: str = "ndjson", chunk_rows: int = 500):
+        """Yield a user's full history as NDJSON or CSV chunks.
+        
+        Rows come from a server-side cursor in its own session, so memory use
+        stays flat however long the history is and the stream outlives the
+        request's session.
+        """
+        names = PROGRESS_FIELDS
+        
+        if export_format == "csv":
+            yield ",".join(names) + "\n"
+        
+        async with read_replicas.session(user_id) as db:
+            user_key = await user_keys.lookup(db, user_id)
+            if user_key is None:
+                return
+            result = await db.stream(
+                select(*progress_columns(user_id))
+                .where(UserProgress.user_key == user_key)
+                .order_by(desc(UserProgress.game_date), desc(UserProgress.id))
+                .execution_options(yield_per=chunk_rows)
+            )
+            async for partition in result.partitions():
+                if export_format == "csv":
+                    buffer = io.StringIO()
+                    csv.writer(buffer, lineterminator="\n").writerows(
+                        [value.isoformat() if isinstance(value, datetime) else value for value in row]
+                        for row in partition
+                    )
+                    yield buffer.getvalue()
+                else:
+                    yield b"".join(orjson.dumps(dict(zip(names, row))) + b"\n" for row in partition)
+    
+    async def get_user_stats(self, user_id: str) -> Optional[UserStatsResponse]:
+        """Get user's overall statistics, read through the cache"""
+        key = user_stats_key(user_id)
+        cached = await cache.get(key)
+        if cached is not None:
+            return UserStatsResponse(**cached)
+        # Taken before the query so a submission committed meanwhile keeps the old row out
+        version = await cache.version(key)
+        
+        result = await self.db.execute(
+            select(*USER_STATS_COLUMNS).where(UserStats.user_id == user_id)
+        )
+        stats = result.first()
+        if not stats:
+            return None
+        
+        response = UserStatsResponse.model_validate(stats._asdict())
+        await cache.set(key, response.model_dump(mode="json"), version=version)
+        return response
+    
+    async def get_daily_progress(self, user_id: str, target_date: date) -> DailyProgressResponse:
+        """Get user's progress for a specific day, aggregated in SQL and cached"""
+        key = daily_progress_key(user_id, target_date)
+        cached = await cache.get(key)
+        if cached is not None:
+            return DailyProgressResponse(**cached)
+        version = await cache.version(key)
+        
         start_date = datetime.combine(target_date, datetime.min.time())
         end_date = start_date + timedelta(days=1)
+        # A user who has never played matches nothing
+        user_key = await user_keys.lookup(self.db, user_id) or 0
         
-        progress_entries = self.db.query(UserProgress)\
-            .filter(and_(
-                UserProgress.user_id == user_id,
-                UserProgress.game_date >= start_date,
-                UserProgress.game_date < end_date
-            ))\
-            .all()
-        
-        if not progress_entries:
-            return DailyProgressResponse(
-                date=target_date.isoformat(),
-                games_played=0,
-                best_time=None,
-                total_score=0,
-                completed_games=0
-            )
+        # Days past the retention window may already be compacted into summaries
+        summary_filter = None
+        if target_date < retention_cutoff():
+            summary_filter = (DailyProgressSummary.user_key == user_key, DailyProgressSummary.day == target_date)
+        facts = progress_facts(
+            (UserProgress.user_key == user_key, UserProgress.game_date >= start_date, UserProgress.game_date < end_date),
+            summary_filter
+        )
         
-        best_time = min(entry.completion_time for entry in progress_entries)
-        total_score = sum(entry.score for entry in progress_entries)
-        completed_games = sum(1 for entry in progress_entries if entry.completed)
+        games_played, best_time, total_score, completed_games = (await self.db.execute(
+            select(
+                func.coalesce(func.sum(facts.c.games), 0),
+                func.min(facts.c.best_time),
+                func.coalesce(func.sum(facts.c.total_score), 0),
+                func.coalesce(func.sum(facts.c.completed), 0)
+            )
+        )).one()
         
-        return DailyProgressResponse(
+        response = DailyProgressResponse(
             date=target_date.isoformat(),
-            games_played=len(progress_entries),
+            games_played=games_played,
             best_time=best_time,
             total_score=total_score,
             completed_games=completed_games
         )
+        await cache.set(key, response.model_dump(mode="json"), version=version)
+        return response
     
-    def get_leaderboard(self, limit: int = 10):
+    async def get_leaderboard(self, limit: int = 10):
         """Get top players by best completion time"""
-        return self.db.query(UserStats)\
-            .filter(UserStats.best_time.isnot(None))\
-            .order_by(UserStats.best_time)\
-            .limit(limit)\
-            .all()
-    
-    def _update_user_stats(self, user_id: str, progress_data: ProgressCreate):
-        """Update or create user statistics"""
-        user_stats = self.db.query(UserStats)\
-            .filter(UserStats.user_id == user_id)\
-            .first()
-        
-        if not user_stats:
-            user_stats = UserStats(
-                user_id=user_id,
-                total_games_played=0,
-                total_score=0,
-                current_streak=0,
-                longest_streak=0
-            )
-            self.db.add(user_stats)
-        
-        # Update basic stats - ensure values are not None
-        user_stats.total_games_played = (user_stats.total_games_played or 0) + 1
-        user_stats.total_score = (user_stats.total_score or 0) + progress_data.score
-        user_stats.last_played = datetime.utcnow()
+        if leaderboard_index.is_warm:
+            return leaderboard_index.top(limit)
+        leaderboard_index.ensure_warming(SessionLocal)
         
-        # Update best time
-        if user_stats.best_time is None or progress_data.completion_time < user_stats.best_time:
-            user_stats.best_time = progress_data.completion_time
+        result = await self.db.execute(
+            select(*RANKED_COLUMNS)
+            .where(UserStats.best_time.isnot(None))
+            .order_by(UserStats.best_time, UserStats.user_id)
+            .limit(limit)
+        )
+        return [RankedUser(*row) for row in result]
+    
+    async def get_user_rank(self, user_id: str, radius: int = 2) -> Optional[dict]:
+        """Get a user's leaderboard rank with up to `radius` neighbors either side"""
+        if leaderboard_index.is_warm:
+            window = leaderboard_index.around(user_id, radius)
+            total_players = len(leaderboard_index)
+        else:
+            leaderboard_index.ensure_warming(SessionLocal)
+            window = await self._rank_window_from_db(user_id, radius)
+            total_players = await self.db.scalar(
+                select(func.count(UserStats.id)).where(UserStats.best_time.isnot(None))
+            ) or 0
         
-        # Calculate average time and lives
-        avg_time_query = self.db.query(func.avg(UserProgress.completion_time))\
-            .filter(UserProgress.user_id == user_id)
-        user_stats.average_time = avg_time_query.scalar()
+        rank = next((position for position, user in window if user.user_id == user_id), None)
+        if rank is None:
+            return None
         
-        avg_lives_query = self.db.query(func.avg(UserProgress.lives_remaining))\
-            .filter(UserProgress.user_id == user_id)
-        user_stats.average_lives_remaining = avg_lives_query.scalar()
+        return {
+            "user_id": user_id,
+            "rank": rank,
+            "total_players": total_players,
+            "neighbors": window
+        }
+    
+    async def _rank_window_from_db(self, user_id: str, radius: int) -> List[tuple]:
+        """Rank window computed with a window function over idx_user_stats_best_time"""
+        ranked = select(
+                *RANKED_COLUMNS,
+                func.row_number().over(order_by=(UserStats.best_time, UserStats.user_id)).label("rank")
+            )\
+            .where(UserStats.best_time.isnot(None))\
+            .subquery()
+        target = select(ranked.c.rank).where(ranked.c.user_id == user_id).scalar_subquery()
         
-        # Update streak
-        self._update_streak(user_stats)
+        rows = (await self.db.execute(
+            select(ranked)
+            .where(ranked.c.rank.between(target - radius, target + radius))
+            .order_by(ranked.c.rank)
+        )).all()
+        return [(row.rank, RankedUser(*row[:-1])) for row in rows]
     
-    def _update_streak(self, user_stats: UserStats):
-        """Update user's playing streak"""
-        today = date.today()
-        yesterday = today - timedelta(days=1)
+    async def _update_user_stats(self, deltas: List[StatsDelta], played_at: datetime,
+                                 keys: Dict[str, int]) -> Dict[str, RankedUser]:
+        """Update or create user statistics in a single atomic upsert"""
+        result = await self.db.execute(self._stats_upsert(deltas, played_at, keys))
+        return {row.user_id: RankedUser(*row) for row in result}
+    
+    def _stats_upsert(self, deltas: List[StatsDelta], played_at: datetime, keys: Dict[str, int]):
+        """Build an INSERT ... ON CONFLICT DO UPDATE that folds per-user totals into user_stats.
         
-        # Check if user played yesterday
-        yesterday_progress = self.db.query(UserProgress)\
-            .filter(and_(
-                UserProgress.user_id == user_stats.user_id,
-                func.date(UserProgress.game_date) == yesterday
-            ))\
-            .first()
-        
-        # Check if user played today (before this entry)
-        today_progress_count = self.db.query(func.count(UserProgress.id))\
-            .filter(and_(
-                UserProgress.user_id == user_stats.user_id,
-                func.date(UserProgress.game_date) == today
-            ))\
-            .scalar()
-        
-        if today_progress_count == 1:  # First game today
-            if yesterday_progress:
-                user_stats.current_streak = (user_stats.current_streak or 0) + 1
-            else:
-                user_stats.current_streak = 1
+        All arithmetic happens in the database against the row's current values,
+        so concurrent submissions for the same user never lose increments.
+        Each user may appear only once in `deltas`.
+        """
+        dialect = self.db.bind.dialect.name
+        insert = pg_insert if dialect == "postgresql" else sqlite_insert
         
-        # Update longest streak
-        current = user_stats.current_streak or 0
-        longest = user_stats.longest_streak or 0
-        if current > longest:
-            user_stats.longest_streak = current
-    
-    def get_game_stats(self):
-        """Get overall game statistics"""
-        total_games = self.db.query(func.count(UserProgress.id)).scalar() or 0
-        total_players = self.db.query(func.count(func.distinct(UserProgress.user_id))).scalar() or 0
-        
-        if total_games == 0:
-            return {
-                "total_players": 0,
-                "average_completion_time": 0.0,
-                "average_lives_remaining": 0.0,
-                "total_games_played": 0,
-                "completion_rate": 0.0
+        today = played_at.date()
+        yesterday = today - timedelta(days=1)
+        
+        stmt = insert(UserStats).values([
+            {
+                "user_id": delta.user_id,
+                "user_key": keys[delta.user_id],
+                "total_games_played": delta.games,
+                "total_score": delta.score,
+                "total_completion_time": delta.completion_time,
+                "total_lives_remaining": delta.lives_remaining,
+                "completed_games": delta.completed_games,
+                "best_time": delta.best_time,
+                "average_time": delta.completion_time / delta.games,
+                "average_lives_remaining": delta.lives_remaining / delta.games,
+                "current_streak": 1,
+                "longest_streak": 1,
+                "last_played": played_at,
+                "last_played_date": today
             }
+            for delta in deltas
+        ])
         
-        avg_time = self.db.query(func.avg(UserProgress.completion_time)).scalar() or 0.0
-        avg_lives = self.db.query(func.avg(UserProgress.lives_remaining)).scalar() or 0.0
-        completed_games = self.db.query(func.count(UserProgress.id))\
-            .filter(UserProgress.completed == True).scalar() or 0
+        stats = UserStats.__table__.c
+        new = stmt.excluded
         
-        return {
-            "total_players": total_players,
-            "average_completion_time": round(avg_time, 2),
-            "average_lives_remaining": round(avg_lives, 2),
-            "total_games_played": total_games,
-            "completion_rate": round((completed_games / total_games) * 100, 2) if total_games > 0 else 0.0
-        }
+        def accumulate(column: str):
+            return func.coalesce(stats[column], 0) + new[column]
+        
+        # A first game today extends yesterday's streak or starts a new one
+        current_streak = case(
+            (stats.last_played_date == today, stats.current_streak),
+            (stats.last_played_date == yesterday, func.coalesce(stats.current_streak, 0) + 1),
+            else_=1
+        )
+        
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[stats.user_id],
+            set_={
+                "total_games_played": accumulate("total_games_played"),
+                "total_score": accumulate("total_score"),
+                "total_completion_time": accumulate("total_completion_time"),
+                "total_lives_remaining": accumulate("total_lives_remaining"),
+                "completed_games": accumulate("completed_games"),
+                "best_time": case(
+                    (or_(stats.best_time.is_(None), new.best_time < stats.best_time), new.best_time),
+                    else_=stats.best_time
+                ),
+                "average_time": accumulate("total_completion_time") / accumulate("total_games_played"),
+                "average_lives_remaining": cast(accumulate("total_lives_remaining"), Float)
+                    / accumulate("total_games_played"),
+                "current_streak": current_streak,
+                "longest_streak": case(
+                    (current_streak > func.coalesce(stats.longest_streak, 0), current_streak),
+                    else_=stats.longest_streak
+                ),
+                "last_played": new.last_played,
+                "last_played_date": new.last_played_date,
+                "updated_at": func.now()
+            }
+        ).returning(
+            UserStats.user_id,
+            UserStats.best_time,
+            UserStats.total_games_played,
+            UserStats.average_time,
+            UserStats.average_lives_remaining
+        )
+        return stmt
     
-    def get_mock_leaderboard(self, user_id: str = None, limit: int = 10):
-        """Get mock leaderboard with realistic data"""
-        import random
+    async def reconcile_user_stats(self, dry_run: bool = False) -> List[dict]:
+        """Rebuild running counters for every user from user_progress and its daily summaries.
         
-        # Mock usernames for demo
-        mock_users = [
-            "SpeedRunner42", "GameMaster", "QuickSolver", "PuzzleKing", "FastFinisher",
-            "TimeBeater", "LifeSaver", "ProGamer", "SwiftPlayer", "ChampionSolver",
-            "RushExpert", "BlazeRunner", "NinjaPlayer", "TurboSolver", "FlashGamer"
-        ]
+        Returns one entry per user whose stored stats drifted from history,
+        listing the mismatched fields as (stored, expected) pairs.
+        """
+        facts = progress_facts(summary_filter=())
+        totals = (await self.db.execute(
+            select(
+                facts.c.user_key,
+                func.sum(facts.c.games),
+                func.coalesce(func.sum(facts.c.total_score), 0),
+                func.min(facts.c.best_time),
+                func.coalesce(func.sum(facts.c.total_time), 0.0),
+                func.coalesce(func.sum(facts.c.total_lives), 0),
+                func.coalesce(func.sum(facts.c.completed), 0),
+                func.max(facts.c.played_at)
+            )
+            .group_by(facts.c.user_key)
+        )).all()
+        
+        play_dates = {}
+        day_rows = (await self.db.execute(
+            select(facts.c.user_key, facts.c.day).distinct()
+        )).all()
+        for user_key, day in day_rows:
+            if isinstance(day, str):
+                day = date.fromisoformat(day)
+            play_dates.setdefault(user_key, []).append(day)
+        
+        external_ids = dict((await self.db.execute(select(User.id, User.external_id))).all())
+        existing = {stats.user_key: stats for stats in (await self.db.execute(select(UserStats))).scalars()}
+        drift = []
+        
+        for user_key, games, score, best, total_time, total_lives, completed, last_game in totals:
+            user_id = external_ids[user_key]
+            current_streak, longest_streak = self._streaks_from_dates(play_dates.get(user_key, []))
+            expected = {
+                "total_games_played": games,
+                "total_score": score,
+                "best_time": best,
+                "total_completion_time": total_time,
+                "total_lives_remaining": total_lives,
+                "completed_games": completed,
+                "average_time": total_time / games,
+                "average_lives_remaining": total_lives / games,
+                "current_streak": current_streak,
+                "longest_streak": longest_streak,
+                "last_played_date": max(play_dates[user_key]) if user_key in play_dates else None,
+            }
+            
+            user_stats = existing.get(user_key)
+            if not user_stats:
+                if last_game is None:
+                    last_game = datetime.combine(expected["last_played_date"], datetime.min.time())
+                user_stats = UserStats(user_id=user_id, user_key=user_key, last_played=last_game)
+                if not dry_run:
+                    self.db.add(user_stats)
+            
+            mismatched = {}
+            for field, value in expected.items():
+                stored = getattr(user_stats, field)
+                if isinstance(value, float) and stored is not None:
+                    same = abs(stored - value) < 1e-6
+                else:
+                    same = stored == value
+                if not same:
+                    mismatched[field] = (stored, value)
+                    if not dry_run:
+                        setattr(user_stats, field, value)
+            
+            if mismatched:
+                drift.append({"user_id": user_id, "fields": mismatched})
         
+        if not dry_run:
+            await self.db.commit()
+            await cache.delete(*(user_stats_key(entry["user_id"]) for entry in drift))
+            if drift:
+                await invalidation_bus.publish({"resync": True})
+        return drift
+    
+    @staticmethod
+    def _streaks_from_dates(play_dates: List[date]):
+        """Return (current_streak, longest_streak) for a set of play days"""
+        current = longest = 0
+        previous = None
+        for day in sorted(play_dates):
+            if previous is not None and day == previous + timedelta(days=1):
+                current += 1
+            else:
+                current = 1
+            longest = max(longest, current)
+            previous = day
+        return current, longest
+    
+    async def get_game_stats(self):
+        """Get overall game statistics"""
+        return await game_stats_cache.overall(self.db)
+    
+    async def get_game_type_stats(self, game_type: str):
+        """Get statistics for a specific game type"""
+        return await game_stats_cache.for_game(self.db, game_type)
+    
+    async def get_mock_leaderboard(self, user_id: str = None, limit: int = 10):
+        """Get mock leaderboard with realistic data"""
         # Generate mock leaderboard entries
         entries = []
-        for i, username in enumerate(mock_users[:limit]):
+        for i, username in enumerate(MOCK_USERS[:limit]):
             # Generate realistic times (15-120 seconds)
             best_time = round(random.uniform(15.5, 120.0), 2)
             total_games = random.randint(5, 50)
@@ -216,19 +682,69 @@ class ProgressService:
         for i, entry in enumerate(entries):
             entry["rank"] = i + 1
         
-        # Find user's rank if provided
+        # Find user's real rank if provided
         your_rank = None
+        total_players = len(MOCK_USERS) + random.randint(50, 200)
         if user_id:
-            # Get user's actual best time or generate one
-            user_stats = self.get_user_stats(user_id)
-            if user_stats and user_stats.best_time:
-                user_time = user_stats.best_time
-                your_rank = sum(1 for entry in entries if entry["best_time"] < user_time) + 1
-            else:
-                your_rank = random.randint(limit + 1, limit + 20)
+            user_rank = await self.get_user_rank(user_id, radius=0)
+            if user_rank:
+                your_rank = user_rank["rank"]
+                total_players = max(total_players, user_rank["total_players"])
         
         return {
             "entries": entries,
             "your_rank": your_rank,
-            "total_players": len(mock_users) + random.randint(50, 200)
-        }
\ No newline at end of file
+            "total_players": total_players
+        }
+
+async def apply_queued_stats(items: List[ProgressCreate], played_at: datetime):
+    """Apply a coalesced write-behind batch in its own session"""
+    async with SessionLocal() as db:
+        await ProgressService(db).apply_stats(items, played_at)
+
+async def invalidate_cache(*keys: str, writers: Iterable[str] = ()):
+    """Delete cache keys here and in every other worker's in-process cache.
+    
+    `writers` just committed games, so every worker pins their reads to the primary.
+    """
+    writers = list(writers)
+    for user_id in writers:
+        read_replicas.mark_written(user_id)
+    await cache.delete(*keys)
+    await invalidation_bus.publish({"keys": list(keys), "writers": writers})
+
+def _fold_stats(message: dict) -> int:
+    """Apply a committed stats change to this worker's memory; returns how many leaderboard rows were stale.
+
+    Leaderboard rows are absolute snapshots and messages from different
+    requests or workers can arrive out of commit order, so the index keeps
+    whichever row has more games. Game stats are deltas and commute.
+    """
+    for user_id in message.get("writers", ()):
+        read_replicas.mark_written(user_id)
+    stale = 0
+    for user in message.get("users", ()):
+        if not leaderboard_index.update(RankedUser(*user)):
+            stale += 1
+    for game_type, games, completion_time, lives_remaining, completed_games, new_player, new_game_player \
+            in message.get("games", ()):
+        game_stats_cache.record(game_type, games, completion_time, lives_remaining, completed_games,
+                                new_player=new_player, new_game_player=new_game_player)
+    if len(message.get("users", ())) > stale or message.get("games"):
+        data_version.bump()
+    return stale
+
+async def apply_published_stats(message: dict):
+    """Apply a stats change another worker committed and published on the invalidation bus"""
+    if not cache.shared:
+        await cache.delete(*message.get("keys", ()))
+    invalidation_bus.stale_rows += _fold_stats(message)
+
+async def resync_local_state():
+    """Rebuild everything this worker holds in memory after it may have missed changes"""
+    game_stats_cache.invalidate()
+    leaderboard_index.reload(SessionLocal)
+    user_keys.clear()
+    if not cache.shared:
+        await cache.clear()
+    data_version.bump()
@@ -0,0 +1,162 @@
+import re
+from datetime import date, datetime, time
+from typing import List, Optional
+from sqlalchemy import select, func, case, delete, literal, null, text, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import PARTITION_PROGRESS, PROGRESS_RETENTION_MONTHS
+from ..models.idempotency_key import IdempotencyKey
+from ..models.progress_summary import DailyProgressSummary
+from ..models.user_progress import UserProgress
+
+PARTITIONS_AHEAD = 3  # months of empty partitions kept ready for new games
+PARTITION_PATTERN = re.compile(r"^user_progress_p(\d{4})(\d{2})$")
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month `months` after (or before) the month of `month`"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def retention_cutoff(today: Optional[date] = None, months: int = PROGRESS_RETENTION_MONTHS) -> date:
+    """Raw rows before this day are due for compaction; later ones are hot"""
+    return add_months(today or datetime.utcnow().date(), -months)
+
+def partition_name(month: date) -> str:
+    return f"user_progress_p{month:%Y%m}"
+
+def progress_facts(raw_filter=(), summary_filter=None):
+    """Raw games and compacted daily summaries as one row set.
+
+    Each row carries game counts and totals, so aggregates come out the same
+    whether or not the games behind them were compacted. Leave
+    `summary_filter` as None for ranges that are still entirely raw, so
+    only the hot partitions are read.
+    """
+    raw = select(
+        UserProgress.user_key,
+        UserProgress.game_type,
+        func.date(UserProgress.game_date).label("day"),
+        UserProgress.game_date.label("played_at"),
+        literal(1).label("games"),
+        UserProgress.completion_time.label("best_time"),
+        UserProgress.completion_time.label("total_time"),
+        UserProgress.score.label("total_score"),
+        UserProgress.lives_remaining.label("total_lives"),
+        case((UserProgress.completed == True, 1), else_=0).label("completed")
+    ).where(*raw_filter)
+    if summary_filter is None:
+        return raw.subquery("progress_facts")
+
+    summary = select(
+        DailyProgressSummary.user_key,
+        DailyProgressSummary.game_type,
+        DailyProgressSummary.day,
+        null(),
+        DailyProgressSummary.games_played,
+        DailyProgressSummary.best_time,
+        DailyProgressSummary.total_completion_time,
+        DailyProgressSummary.total_score,
+        DailyProgressSummary.total_lives_remaining,
+        DailyProgressSummary.completed_games
+    ).where(*summary_filter)
+    return union_all(raw, summary).subquery("progress_facts")
+
+async def list_partitions(db) -> List[date]:
+    """Months that currently have a user_progress partition"""
+    rows = await db.execute(text(
+        "SELECT child.relname FROM pg_inherits"
+        " JOIN pg_class child ON child.oid = pg_inherits.inhrelid"
+        " JOIN pg_class parent ON parent.oid = pg_inherits.inhparent"
+        " WHERE parent.relname = 'user_progress'"
+    ))
+    months = []
+    for (name,) in rows:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+async def ensure_partitions(db, today: Optional[date] = None):
+    """Create monthly partitions from the retention cutoff to PARTITIONS_AHEAD months ahead.
+
+    A default partition catches games outside that range (backfills, clock
+    skew) so inserts never fail; compaction clears its old rows.
+    """
+    if not PARTITION_PROGRESS:
+        return
+    today = today or datetime.utcnow().date()
+    month = retention_cutoff(today)
+    last = add_months(today, PARTITIONS_AHEAD)
+    while month <= last:
+        following = add_months(month, 1)
+        await db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF user_progress"
+            f" FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+        ))
+        month = following
+    await db.execute(text("CREATE TABLE IF NOT EXISTS user_progress_default PARTITION OF user_progress DEFAULT"))
+
+async def compact_progress(db: AsyncSession, before: Optional[date] = None, dry_run: bool = False) -> dict:
+    """Fold raw games before `before` into daily summaries and remove them, in one transaction.
+
+    user_stats is untouched: its counters already include these games, and
+    reconcile-stats and the game stats read summaries alongside raw rows, so
+    every total stays exact. Whole monthly partitions are dropped rather
+    than deleted row by row.
+    """
+    cutoff = before or retention_cutoff()
+    old = UserProgress.game_date < datetime.combine(cutoff, time.min)
+    rows = await db.scalar(select(func.count(UserProgress.id)).where(old)) or 0
+    report = {"cutoff": cutoff.isoformat(), "rows": rows, "partitions_dropped": []}
+    if dry_run or rows == 0:
+        return report
+
+    day = func.date(UserProgress.game_date)
+    game_type = func.coalesce(UserProgress.game_type, "connections")
+    grouped = select(
+        UserProgress.user_key,
+        day,
+        game_type,
+        func.count(UserProgress.id),
+        func.min(UserProgress.completion_time),
+        func.sum(UserProgress.completion_time),
+        func.coalesce(func.sum(UserProgress.score), 0),
+        func.coalesce(func.sum(UserProgress.lives_remaining), 0),
+        func.sum(case((UserProgress.completed == True, 1), else_=0))
+    ).where(old).group_by(UserProgress.user_key, day, game_type)
+
+    insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+    summary = DailyProgressSummary.__table__.c
+    stmt = insert(DailyProgressSummary).from_select(
+        ["user_key", "day", "game_type", "games_played", "best_time", "total_completion_time",
+         "total_score", "total_lives_remaining", "completed_games"],
+        grouped
+    )
+    new = stmt.excluded
+    # A day compacted twice (late rows with an old game_date) adds to its summary
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[summary.user_key, summary.day, summary.game_type],
+        set_={
+            "games_played": summary.games_played + new.games_played,
+            "best_time": case((new.best_time < summary.best_time, new.best_time), else_=summary.best_time),
+            "total_completion_time": summary.total_completion_time + new.total_completion_time,
+            "total_score": summary.total_score + new.total_score,
+            "total_lives_remaining": summary.total_lives_remaining + new.total_lives_remaining,
+            "completed_games": summary.completed_games + new.completed_games
+        }
+    )
+    await db.execute(stmt)
+    # Retries of games this old are long over
+    await db.execute(delete(IdempotencyKey).where(IdempotencyKey.progress_id.in_(select(UserProgress.id).where(old))))
+
+    if PARTITION_PROGRESS:
+        for month in await list_partitions(db):
+            if add_months(month, 1) <= cutoff:
+                await db.execute(text(f"DROP TABLE {partition_name(month)}"))
+                report["partitions_dropped"].append(partition_name(month))
+    # Whatever is left (unpartitioned table, default partition) goes row by row
+    await db.execute(delete(UserProgress).where(old))
+    await ensure_partitions(db)
+    await db.commit()
+    return report
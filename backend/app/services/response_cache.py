@@ -0,0 +1,74 @@
+import os
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+
+class DataVersion:
+    """Write counter behind the ETags of shared read endpoints.
+
+    Bumped whenever committed games change the leaderboard or game stats, and
+    whenever those in-memory copies are reloaded. Tags carry a per-process
+    epoch so a restarted or different worker never matches an old tag.
+    """
+
+    def __init__(self):
+        self.epoch = os.urandom(4).hex()
+        self.value = 0
+        self.modified_at = datetime.now(timezone.utc)
+
+    def bump(self):
+        self.value += 1
+        self.modified_at = datetime.now(timezone.utc)
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.epoch}-{self.value}"'
+
+    @property
+    def last_modified(self) -> str:
+        return format_datetime(self.modified_at, usegmt=True)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against the current tag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+class ResponseCache:
+    """Serialized JSON bodies for the current data version, one per key.
+
+    A body is only served while the version it was rendered at is still
+    current; older bodies are replaced on the next miss.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._bodies: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, etag: str) -> Optional[bytes]:
+        entry = self._bodies.get(key)
+        if entry is None or entry[0] != etag:
+            self.misses += 1
+            return None
+        self._bodies.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, etag: str, body: bytes):
+        self._bodies[key] = (etag, body)
+        self._bodies.move_to_end(key)
+        while len(self._bodies) > self.max_entries:
+            self._bodies.popitem(last=False)
+
+    def status(self) -> dict:
+        return {"entries": len(self._bodies), "hits": self.hits, "misses": self.misses}
+
+data_version = DataVersion()
+response_cache = ResponseCache()
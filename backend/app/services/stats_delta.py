@@ -0,0 +1,34 @@
+from dataclasses import dataclass
+from typing import Optional
+from ..schemas.progress_schemas import ProgressCreate
+
+@dataclass
+class StatsDelta:
+    """Totals of one or more games played by a single user.
+
+    Used to fold several submissions into one upsert row, either per user
+    (user_stats) or per user and game type (game_leaderboard).
+    """
+    user_id: str
+    game_type: Optional[str] = None
+    games: int = 0
+    score: int = 0
+    completion_time: float = 0.0
+    lives_remaining: int = 0
+    completed_games: int = 0
+    best_time: Optional[float] = None
+
+    @classmethod
+    def from_progress(cls, progress_data: ProgressCreate, game_type: Optional[str] = None) -> "StatsDelta":
+        delta = cls(user_id=progress_data.user_id, game_type=game_type)
+        delta.add(progress_data)
+        return delta
+
+    def add(self, progress_data: ProgressCreate):
+        self.games += 1
+        self.score += progress_data.score
+        self.completion_time += progress_data.completion_time
+        self.lives_remaining += progress_data.lives_remaining
+        self.completed_games += 1 if progress_data.completed else 0
+        if self.best_time is None or progress_data.completion_time < self.best_time:
+            self.best_time = progress_data.completion_time
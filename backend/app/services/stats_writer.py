@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import date, datetime
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+from ..schemas.progress_schemas import ProgressCreate
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_ENABLED = os.getenv("STATS_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+QUEUE_MAX_DEPTH = int(os.getenv("STATS_QUEUE_MAX_DEPTH", "10000"))
+BATCH_SIZE = int(os.getenv("STATS_BATCH_SIZE", "500"))
+BATCH_LINGER = float(os.getenv("STATS_BATCH_LINGER_MS", "50")) / 1000  # wait for more items before flushing
+PUT_TIMEOUT = float(os.getenv("STATS_QUEUE_PUT_TIMEOUT", "1"))  # seconds a full queue makes a request wait
+SHUTDOWN_TIMEOUT = float(os.getenv("STATS_SHUTDOWN_TIMEOUT", "30"))
+
+ApplyBatch = Callable[[List[ProgressCreate], datetime], Awaitable[None]]
+
+class QueuedGame(NamedTuple):
+    progress: ProgressCreate
+    played_at: datetime
+
+class StatsWriteBehind:
+    """Background worker that applies user stats updates in coalesced micro-batches.
+
+    Requests commit the raw user_progress row and enqueue the game. The worker
+    drains up to BATCH_SIZE games at a time and applies them with one upsert
+    per user. If the process dies with games still queued, their rows are
+    safe in user_progress and `python -m app.management reconcile-stats`
+    rebuilds the stats.
+    """
+
+    def __init__(self, max_depth: int = QUEUE_MAX_DEPTH, batch_size: int = BATCH_SIZE,
+                 linger: float = BATCH_LINGER, put_timeout: float = PUT_TIMEOUT):
+        self.max_depth = max_depth
+        self.batch_size = batch_size
+        self.linger = linger
+        self.put_timeout = put_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._apply: Optional[ApplyBatch] = None
+        self._accepting = False
+        self._enqueued_at = deque()
+        self.applied = 0
+        self.batches = 0
+        self.failed = 0
+        self.overflowed = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._accepting
+
+    def start(self, apply: ApplyBatch):
+        self._apply = apply
+        self._queue = asyncio.Queue(maxsize=self.max_depth)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        self._accepting = True
+
+    async def submit(self, progress: ProgressCreate) -> bool:
+        """Queue a committed game; False if the queue stayed full past the put timeout"""
+        item = QueuedGame(progress, datetime.utcnow())
+        enqueued_at = time.monotonic()
+        self._enqueued_at.append(enqueued_at)
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(item), self.put_timeout)
+            except asyncio.TimeoutError:
+                self._enqueued_at.remove(enqueued_at)
+                self.overflowed += 1
+                return False
+        return True
+
+    async def stop(self, timeout: float = SHUTDOWN_TIMEOUT):
+        """Stop accepting games and flush everything already queued"""
+        if self._task is None:
+            return
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error("Stats queue not drained on shutdown, %d games left; run reconcile-stats",
+                         self._queue.qsize())
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def status(self) -> dict:
+        depth = self._queue.qsize() if self._queue is not None else 0
+        return {
+            "enabled": self.is_running,
+            "depth": depth,
+            "max_depth": self.max_depth,
+            "lag_seconds": round(time.monotonic() - self._enqueued_at[0], 3) if self._enqueued_at else 0.0,
+            "applied": self.applied,
+            "batches": self.batches,
+            "failed": self.failed,
+            "overflowed": self.overflowed
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.linger
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[QueuedGame]):
+        # Streaks, last_played_date and the daily/weekly boards key on the day a
+        # game was played, so a backlog spanning midnight goes in one upsert per day
+        days: Dict[date, List[QueuedGame]] = {}
+        for item in batch:
+            days.setdefault(item.played_at.date(), []).append(item)
+        try:
+            for games in days.values():
+                try:
+                    await self._apply([item.progress for item in games], games[-1].played_at)
+                    self.applied += len(games)
+                except Exception:
+                    self.failed += len(games)
+                    logger.exception("Failed to apply %d queued games; run reconcile-stats", len(games))
+        finally:
+            self.batches += 1
+            for _ in batch:
+                self._enqueued_at.popleft()
+                self._queue.task_done()
+
+stats_writer = StatsWriteBehind()
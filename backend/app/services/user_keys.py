@@ -0,0 +1,173 @@
+import os
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+from sqlalchemy import inspect, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from ..database import SessionLocal
+from ..models.progress_summary import DailyProgressSummary
+from ..models.user import User
+from ..models.user_progress import UserProgress, UserStats
+
+USER_KEY_CACHE_MAX_ENTRIES = int(os.getenv("USER_KEY_CACHE_MAX_ENTRIES", "100000"))
+
+class UserKeyCache:
+    """Interns external user ids to users.id on the request path.
+
+    Keys are never reassigned, so entries can't go stale and every worker
+    may keep its own copy. Unknown ids are not cached, so a user created
+    by another worker is found on the next lookup. Replacing the users
+    table is the exception: clear() the cache with it.
+    """
+
+    def __init__(self, max_entries: int = USER_KEY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._keys: "OrderedDict[str, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+
+    def _get(self, user_id: str) -> Optional[int]:
+        key = self._keys.get(user_id)
+        if key is None:
+            self.misses += 1
+            return None
+        self._keys.move_to_end(user_id)
+        self.hits += 1
+        return key
+
+    def _remember(self, user_id: str, key: int):
+        self._keys[user_id] = key
+        self._keys.move_to_end(user_id)
+        while len(self._keys) > self.max_entries:
+            self._keys.popitem(last=False)
+
+    async def lookup(self, db, user_id: str) -> Optional[int]:
+        """Key of an existing user, or None if they have never played"""
+        key = self._get(user_id)
+        if key is None:
+            key = await db.scalar(select(User.id).where(User.external_id == user_id))
+            if key is not None:
+                self._remember(user_id, key)
+        return key
+
+    async def resolve(self, user_ids: Iterable[str]) -> Dict[str, int]:
+        """Keys for these users, creating the ones that don't exist yet.
+
+        New users are committed in their own short transaction on the
+        primary, so a key is never cached for a row that a rolled-back
+        request inserted.
+        """
+        keys = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            key = self._get(user_id)
+            if key is None:
+                missing.append(user_id)
+            else:
+                keys[user_id] = key
+        if not missing:
+            return keys
+
+        async with SessionLocal() as db:
+            insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+            result = await db.execute(
+                insert(User).values([{"external_id": user_id} for user_id in missing])
+                .on_conflict_do_nothing(index_elements=[User.external_id])
+                .returning(User.id)
+            )
+            self.created += len(result.all())
+            rows = await db.execute(select(User.external_id, User.id).where(User.external_id.in_(missing)))
+            await db.commit()
+        for user_id, key in rows:
+            self._remember(user_id, key)
+            keys[user_id] = key
+        return keys
+
+    def clear(self):
+        self._keys.clear()
+
+    def status(self) -> dict:
+        return {
+            "entries": len(self._keys),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "created": self.created
+        }
+
+user_keys = UserKeyCache()
+
+def _columns(conn, table: str) -> set:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+def _migrate_user_keys(conn) -> dict:
+    tables = set(inspect(conn).get_table_names())
+    # Only tables still carrying the old string column need converting
+    pending = [
+        table for table in ("user_progress", "user_stats", "user_progress_daily")
+        if table in tables and "user_id" in _columns(conn, table) and "user_key" not in _columns(conn, table)
+    ]
+    report = {"tables": pending, "users": 0}
+    if not pending:
+        return report
+
+    User.__table__.create(conn, checkfirst=True)
+    for table in pending:
+        conn.execute(text(
+            f"INSERT INTO users (external_id) SELECT DISTINCT user_id FROM {table}"
+            " WHERE user_id NOT IN (SELECT external_id FROM users)"
+        ))
+    report["users"] = conn.execute(text("SELECT COUNT(*) FROM users")).scalar()
+
+    postgres = conn.dialect.name == "postgresql"
+    for table in pending:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN user_key INTEGER REFERENCES users (id)"))
+        conn.execute(text(
+            f"UPDATE {table} SET user_key = (SELECT id FROM users WHERE users.external_id = {table}.user_id)"
+        ))
+        if postgres:
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN user_key SET NOT NULL"))
+
+    # user_progress: old string indexes out, the column with them
+    if "user_progress" in pending:
+        for name in ("idx_user_date", "idx_user_completion_time", "idx_game_type_user", "ix_user_progress_user_id"):
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        conn.execute(text("ALTER TABLE user_progress DROP COLUMN user_id"))
+        for index in UserProgress.__table__.indexes:
+            if "user_key" in index.columns:
+                index.create(conn, checkfirst=True)
+
+    # user_stats keeps user_id for display and as the leaderboard tie-break
+    if "user_stats" in pending:
+        for index in UserStats.__table__.indexes:
+            if "user_key" in index.columns:
+                index.create(conn, checkfirst=True)
+
+    # user_progress_daily's unique key includes user_id; SQLite can't drop such a column, so rebuild
+    if "user_progress_daily" in pending:
+        if postgres:
+            conn.execute(text("ALTER TABLE user_progress_daily DROP COLUMN user_id"))
+            conn.execute(text(
+                "ALTER TABLE user_progress_daily ADD CONSTRAINT uq_progress_daily_user_key_day_game"
+                " UNIQUE (user_key, day, game_type)"
+            ))
+        else:
+            conn.execute(text("ALTER TABLE user_progress_daily RENAME TO user_progress_daily_old"))
+            conn.execute(text("DROP INDEX IF EXISTS ix_user_progress_daily_id"))
+            DailyProgressSummary.__table__.create(conn)
+            columns = ", ".join(column.name for column in DailyProgressSummary.__table__.columns)
+            conn.execute(text(
+                f"INSERT INTO user_progress_daily ({columns}) SELECT {columns} FROM user_progress_daily_old"
+            ))
+            conn.execute(text("DROP TABLE user_progress_daily_old"))
+    return report
+
+async def migrate_user_keys(engine) -> dict:
+    """Convert a database from string user_id columns to user_key, in one transaction.
+
+    Safe to re-run; tables already converted are skipped. Stop the API
+    first, since rows written mid-migration would use the old layout.
+    """
+    async with engine.begin() as conn:
+        return await conn.run_sync(_migrate_user_keys)
@@ -0,0 +1,198 @@
+"""Before/after throughput of the progress API under concurrent load.
+
+"blocking" replays the previous handlers (async def endpoints calling a
+synchronous SQLAlchemy Session on the event loop); "async" drives the real
+app on the async engine. Both serve the same seeded database and the same
+request mix, while a heartbeat task measures how late the event loop wakes
+up behind database work.
+
+--latency-ms adds a simulated network round trip to every statement, the
+way a remote Postgres behaves: the sync driver sleeps on the loop thread,
+the async driver awaits.
+
+Usage (from backend/):
+    python -m benchmarks.async_throughput [--users 20000] [--concurrency 50] [--duration 10] [--latency-ms 2]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "throughput.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, desc, event, func, insert
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.util import await_only
+
+from app.database import Base, get_engine
+from app.main import app as async_app
+from app.models.user import User
+from app.models.user_progress import UserProgress, UserStats
+
+async_engine = get_engine()
+# Sized so pool checkout never blocks the loop; otherwise "blocking" stalls outright
+sync_engine = create_engine(
+    f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False}, pool_size=100, max_overflow=0
+)
+SyncSession = sessionmaker(bind=sync_engine, autoflush=False)
+
+
+def get_sync_db():
+    db = SyncSession()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+blocking_app = FastAPI()
+
+
+@blocking_app.get("/health")
+async def blocking_health():
+    return {"status": "healthy"}
+
+
+@blocking_app.get("/api/progress/leaderboard")
+async def blocking_leaderboard(limit: int = 10, db: Session = Depends(get_sync_db)):
+    rows = db.query(UserStats).filter(UserStats.best_time.isnot(None))\
+        .order_by(UserStats.best_time).limit(limit).all()
+    return [{"user_id": row.user_id, "best_time": row.best_time} for row in rows]
+
+
+@blocking_app.get("/api/progress/game-stats")
+async def blocking_game_stats(db: Session = Depends(get_sync_db)):
+    return {
+        "total_games_played": db.query(func.count(UserProgress.id)).scalar(),
+        "average_completion_time": db.query(func.avg(UserProgress.completion_time)).scalar(),
+    }
+
+
+@blocking_app.get("/api/progress/user/{user_id}/stats")
+async def blocking_user_stats(user_id: str, db: Session = Depends(get_sync_db)):
+    row = db.query(UserStats).filter(UserStats.user_id == user_id).first()
+    return {"user_id": row.user_id, "total_games_played": row.total_games_played}
+
+
+@blocking_app.get("/api/progress/user/{user_id}")
+async def blocking_user_progress(user_id: str, limit: int = 50, db: Session = Depends(get_sync_db)):
+    rows = db.query(UserProgress).join(User, User.id == UserProgress.user_key)\
+        .filter(User.external_id == user_id)\
+        .order_by(desc(UserProgress.game_date)).limit(limit).all()
+    return [{"id": row.id, "completion_time": row.completion_time} for row in rows]
+
+
+def seed(users: int, active: int, history: int):
+    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        # user-{i} gets key i + 1
+        conn.execute(insert(User), [{"external_id": f"user-{i}"} for i in range(users)])
+        conn.execute(insert(UserStats), [
+            {
+                "user_id": f"user-{i}",
+                "user_key": i + 1,
+                "total_games_played": 1,
+                "total_score": 0,
+                "best_time": random.uniform(10, 300),
+                "average_time": random.uniform(10, 300),
+            }
+            for i in range(users)
+        ])
+        conn.execute(insert(UserProgress), [
+            {"user_key": i + 1, "completion_time": random.uniform(10, 300)}
+            for i in range(active)
+            for _ in range(history)
+        ])
+
+
+def add_latency(seconds: float):
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def blocking_round_trip(*args):
+        time.sleep(seconds)
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def awaited_round_trip(*args):
+        await_only(asyncio.sleep(seconds))
+
+
+def pick_path(active: int) -> str:
+    user_id = f"user-{random.randrange(active)}"
+    roll = random.random()
+    if roll < 0.02:
+        return "/api/progress/game-stats"
+    if roll < 0.2:
+        return "/api/progress/leaderboard"
+    if roll < 0.6:
+        return f"/api/progress/user/{user_id}/stats"
+    return f"/api/progress/user/{user_id}"
+
+
+async def drive(app, concurrency: int, duration: float, active: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    latencies, loop_lag = [], []
+    deadline = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(pick_path(active))
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        async def heartbeat():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                await asyncio.sleep(0.01)
+                loop_lag.append(time.perf_counter() - started - 0.01)
+
+        await asyncio.gather(heartbeat(), *(worker() for _ in range(concurrency)))
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "loop_lag_max_ms": max(loop_lag) * 1000,
+    }
+
+
+async def run(args):
+    results = {}
+    for name, app in (("blocking", blocking_app), ("async", async_app)):
+        results[name] = await drive(app, args.concurrency, args.duration, args.active)
+        print(f"{name:>8}: {results[name]['throughput']:8.1f} req/s  "
+              f"p50 {results[name]['p50_ms']:7.1f} ms  p99 {results[name]['p99_ms']:7.1f} ms  "
+              f"loop lag worst {results[name]['loop_lag_max_ms']:7.1f} ms")
+    gain = results["async"]["throughput"] / results["blocking"]["throughput"]
+    print(f"async / blocking throughput: {gain:.2f}x")
+    await async_engine.dispose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20000, help="user_stats rows to seed")
+    parser.add_argument("--active", type=int, default=500, help="users with progress history")
+    parser.add_argument("--history", type=int, default=50, help="games per active user")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="simulated round trip per statement")
+    args = parser.parse_args()
+
+    seed(args.users, args.active, args.history)
+    if args.latency_ms:
+        add_latency(args.latency_ms / 1000)
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
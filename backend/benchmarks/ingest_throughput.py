@@ -0,0 +1,118 @@
+"""Rows/sec for single and batch progress ingestion.
+
+Sends the same synthetic games through POST /api/progress/ one at a time
+and through POST /api/progress/batch in chunks, each against a fresh
+SQLite database (or DATABASE_URL when set). Some games leave the
+optional fields null, as clients may. Before timing, one batch mixing
+such games with an invalid one checks that only the invalid item fails.
+
+Usage (from backend/):
+    python -m benchmarks.ingest_throughput [--rows 5000] [--users 500] [--batch-size 500]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/ingest.db"
+
+import httpx
+
+from app.database import Base, get_engine
+from app.main import app
+from app.services.cache import cache
+from app.services.progress_service import resync_local_state
+
+engine = get_engine()
+
+
+def make_games(rows: int, users: int):
+    games = [
+        {
+            "user_id": f"user-{random.randrange(users)}",
+            "completion_time": round(random.uniform(10, 120), 2),
+            "score": random.randint(0, 100),
+            "completed": random.random() < 0.8,
+            "lives_remaining": random.randint(0, 5),
+            "game_type": random.choice(["connections", "wordle"]),
+        }
+        for _ in range(rows)
+    ]
+    # Optional fields sent as null are stored as their defaults
+    for game in games[::50]:
+        game.update(score=None, lives_remaining=None, game_type=None)
+    return games
+
+
+async def check_partial_failure(client, games):
+    """A batch with one invalid item creates every other item, nullable fields included"""
+    items = [*games[:3], {**games[3], "completion_time": -1}, *games[4:6]]
+    response = await client.post("/api/progress/batch", json={"items": items})
+    response.raise_for_status()
+    body = response.json()
+    failed = [result["index"] for result in body["results"] if result["status"] == "error"]
+    assert body["created"] == len(items) - 1 and failed == [3], body
+
+
+async def reset():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    # User keys, leaderboard rows, game totals and cached responses all point at the dropped tables
+    await resync_local_state()
+    await cache.clear()
+
+
+async def single(client, games) -> float:
+    started = time.perf_counter()
+    for game in games:
+        (await client.post("/api/progress/", json=game)).raise_for_status()
+    return time.perf_counter() - started
+
+
+async def batch(client, games, batch_size: int) -> float:
+    started = time.perf_counter()
+    for offset in range(0, len(games), batch_size):
+        response = await client.post("/api/progress/batch", json={"items": games[offset:offset + batch_size]})
+        response.raise_for_status()
+        assert response.json()["failed"] == 0
+    return time.perf_counter() - started
+
+
+async def run(args):
+    games = make_games(args.rows, args.users)
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await reset()
+            await check_partial_failure(client, games)
+            await reset()
+            single_elapsed = await single(client, games)
+            await reset()
+            batch_elapsed = await batch(client, games, args.batch_size)
+    finally:
+        # An open aiosqlite connection would keep a failed run from exiting
+        await engine.dispose()
+
+    single_rate = args.rows / single_elapsed
+    batch_rate = args.rows / batch_elapsed
+    print(f"single: {single_rate:9.0f} rows/s  ({single_elapsed * 1e6 / args.rows:8.1f} us/row)")
+    print(f" batch: {batch_rate:9.0f} rows/s  ({batch_elapsed * 1e6 / args.rows:8.1f} us/row, batch size {args.batch_size})")
+    print(f"batch per-row cost is {batch_elapsed / single_elapsed:.1%} of single")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=500)
+    asyncio.run(run(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Staleness between workers: time from one worker publishing a change to each peer applying it.
+
+Starts --workers subscriber processes on the configured bus backend, then
+publishes stats-sized messages at --rate per second for --duration seconds.
+Each subscriber records publish-to-apply lag per message and reports
+percentiles and losses. A peer's reads are stale for at most this lag.
+
+The file backend needs nothing else; the postgres backend uses DATABASE_URL.
+
+Usage (from backend/):
+    python -m benchmarks.invalidation_lag [--backend file|postgres] [--workers 4] [--rate 500] [--duration 10]
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+
+from app.services.invalidation_bus import FileBus, PostgresBus
+
+
+def build(backend: str, path: str):
+    if backend == "postgres":
+        return PostgresBus(channel="invalidation_lag_benchmark")
+    return FileBus(path, poll_interval=float(os.getenv("INVALIDATION_POLL_MS", "50")) / 1000)
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * p / 100) - 1)]
+
+
+async def subscribe(backend: str, path: str, ready, done, results):
+    bus = build(backend, path)
+    lags = []
+
+    async def handler(message):
+        lags.append(time.time() - message["sent_at"])
+
+    async def resync():
+        pass
+
+    await bus.start(handler, resync)
+    while not bus.connected:
+        await asyncio.sleep(0.01)
+    ready.set()
+    while not done.is_set():
+        await asyncio.sleep(0.05)
+    # Let the last poll interval drain
+    await asyncio.sleep(0.5)
+    await bus.stop()
+    results.put({"received": len(lags), "resyncs": bus.resyncs, "lags": lags})
+
+
+def run_subscriber(backend, path, ready, done, results):
+    asyncio.run(subscribe(backend, path, ready, done, results))
+
+
+async def publish(backend: str, path: str, rate: float, duration: float) -> int:
+    bus = build(backend, path)
+    message = {
+        "users": [["user-000042", 31.5, 120, 44.2, 2.1]],
+        "games": [["connections", 1, 31.5, 2, 1, False, False]],
+        "keys": ["user_stats:user-000042", "daily:user-000042:2025-01-08"]
+    }
+    sent = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        await bus.publish(message)
+        sent += 1
+        delay = started + sent / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    await bus.stop()
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["file", "postgres"], default="file")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=500, help="messages per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "invalidation.log")
+    context = multiprocessing.get_context("spawn")
+    done = context.Event()
+    results = context.Queue()
+    readies = [context.Event() for _ in range(args.workers)]
+    workers = [context.Process(target=run_subscriber, args=(args.backend, path, ready, done, results))
+               for ready in readies]
+    for worker in workers:
+        worker.start()
+    for ready in readies:
+        ready.wait(30)
+
+    sent = asyncio.run(publish(args.backend, path, args.rate, args.duration))
+    done.set()
+    reports = [results.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    lags = [lag for report in reports for lag in report["lags"]]
+    summary = {
+        "backend": args.backend,
+        "workers": args.workers,
+        "sent": sent,
+        "received_per_worker": [report["received"] for report in reports],
+        "resyncs": sum(report["resyncs"] for report in reports),
+        "lag_ms": {
+            name: round(value * 1000, 3) if value is not None else None
+            for name, value in (("p50", percentile(lags, 50)), ("p95", percentile(lags, 95)),
+                                ("p99", percentile(lags, 99)), ("max", max(lags, default=None)))
+        }
+    }
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""Reproducible load test for the progress API.
+
+Seeds a fresh database with synthetic history (thousands to millions of
+user_progress rows, with matching user_stats and all-time game
+leaderboards), then drives a weighted mix of submit, history, stats and
+leaderboard calls through the ASGI app in-process. Reports p50/p95/p99
+latency, throughput and SQL statements per request for each endpoint.
+
+Runs offline against a throwaway SQLite file by default; set DATABASE_URL
+to point it at a local Postgres instead (its tables are dropped and
+recreated). --output saves the results as JSON and --compare checks them
+against an earlier run, exiting 1 when an endpoint regressed.
+
+Usage (from backend/):
+    python -m benchmarks.load_test [--rows 100000] [--users 5000] [--concurrency 20] [--duration 20]
+        [--mix submit=10,history=25,stats=25,daily=10,leaderboard=20,rank=5,game_stats=5]
+        [--output results.json] [--compare baseline.json --tolerance 0.2 --min-delta-ms 1]
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/load_test.db"
+
+import httpx
+from sqlalchemy import event, insert
+
+from app.database import Base, SessionLocal, get_engine
+from app.main import app
+from app.models.game_leaderboard import GameLeaderboardEntry
+from app.models.user import User
+from app.models.user_progress import UserProgress, UserStats
+from app.services.leaderboard_index import leaderboard_index
+from app.services.progress_service import ProgressService
+
+GAME_TYPES = ["connections", "wordle", "crossword"]
+DEFAULT_MIX = "submit=10,history=25,stats=25,daily=10,leaderboard=20,rank=5,game_stats=5"
+SEED_CHUNK = 10000
+
+# Statement counter for the request running in the current task
+_statements = contextvars.ContextVar("statements", default=None)
+
+
+engine = get_engine()
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_statement(*args):
+    counter = _statements.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"unknown endpoint {name!r}; choose from {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def pick_user(rng: random.Random, users: int) -> str:
+    # Skewed toward low ids so a minority of players makes most requests
+    return f"user-{int(users * rng.random() ** 2)}"
+
+
+def make_game(rng: random.Random, user_id: str) -> dict:
+    return {
+        "user_id": user_id,
+        "completion_time": round(rng.uniform(10, 300), 2),
+        "score": rng.randint(0, 100),
+        "completed": rng.random() < 0.8,
+        "lives_remaining": rng.randint(0, 5),
+        "game_type": rng.choice(GAME_TYPES),
+    }
+
+
+ENDPOINTS = {
+    "submit": lambda rng, users: ("POST", "/api/progress/", make_game(rng, pick_user(rng, users))),
+    "history": lambda rng, users: ("GET", f"/api/progress/user/{pick_user(rng, users)}/history?limit=50", None),
+    "stats": lambda rng, users: ("GET", f"/api/progress/user/{pick_user(rng, users)}/stats", None),
+    "daily": lambda rng, users: ("GET", f"/api/progress/user/{pick_user(rng, users)}/daily", None),
+    "leaderboard": lambda rng, users: ("GET", "/api/progress/leaderboard?limit=10", None),
+    "rank": lambda rng, users: ("GET", f"/api/progress/leaderboard/rank/{pick_user(rng, users)}", None),
+    "game_stats": lambda rng, users: ("GET", "/api/progress/game-stats", None),
+}
+
+
+async def seed(rows: int, users: int, days: int, rng: random.Random) -> float:
+    """Insert synthetic history plus the stats and all-time boards it implies"""
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        # user-{i} gets key i + 1
+        for offset in range(0, users, SEED_CHUNK):
+            await conn.execute(insert(User), [{"external_id": f"user-{i}"}
+                                              for i in range(offset, min(offset + SEED_CHUNK, users))])
+
+    now = datetime.utcnow()
+    totals = {}
+    boards = {}
+    play_days = {}
+    for offset in range(0, rows, SEED_CHUNK):
+        chunk = []
+        for i in range(offset, min(offset + SEED_CHUNK, rows)):
+            # Every user gets at least one game, the rest follow the request skew
+            user_id = f"user-{i}" if i < users else pick_user(rng, users)
+            game = make_game(rng, user_id)
+            game["game_date"] = game["created_at"] = now - timedelta(seconds=rng.uniform(0, days * 86400))
+            game["user_key"] = int(game.pop("user_id")[5:]) + 1
+            chunk.append(game)
+
+            stats = totals.setdefault(user_id, [0, 0, None, 0.0, 0, 0, game["game_date"]])
+            stats[0] += 1
+            stats[1] += game["score"]
+            stats[2] = game["completion_time"] if stats[2] is None else min(stats[2], game["completion_time"])
+            stats[3] += game["completion_time"]
+            stats[4] += game["lives_remaining"]
+            stats[5] += game["completed"]
+            stats[6] = max(stats[6], game["game_date"])
+            play_days.setdefault(user_id, set()).add(game["game_date"].date())
+
+            board = boards.setdefault((user_id, game["game_type"]), [0, None, 0.0])
+            board[0] += 1
+            board[1] = game["completion_time"] if board[1] is None else min(board[1], game["completion_time"])
+            board[2] += game["completion_time"]
+        async with engine.begin() as conn:
+            await conn.execute(insert(UserProgress), chunk)
+
+    stats_rows = []
+    for user_id, (games, score, best, total_time, lives, completed, last_played) in totals.items():
+        current_streak, longest_streak = ProgressService._streaks_from_dates(play_days[user_id])
+        stats_rows.append({
+            "user_id": user_id,
+            "user_key": int(user_id[5:]) + 1,
+            "total_games_played": games,
+            "total_score": score,
+            "best_time": best,
+            "total_completion_time": total_time,
+            "total_lives_remaining": lives,
+            "completed_games": completed,
+            "average_time": total_time / games,
+            "average_lives_remaining": lives / games,
+            "current_streak": current_streak,
+            "longest_streak": longest_streak,
+            "last_played": last_played,
+            "last_played_date": last_played.date(),
+        })
+    board_rows = [
+        {"game_type": game_type, "period": "all", "user_id": user_id,
+         "games_played": games, "best_time": best, "total_completion_time": total_time}
+        for (user_id, game_type), (games, best, total_time) in boards.items()
+    ]
+    async with engine.begin() as conn:
+        for offset in range(0, len(stats_rows), SEED_CHUNK):
+            await conn.execute(insert(UserStats), stats_rows[offset:offset + SEED_CHUNK])
+        for offset in range(0, len(board_rows), SEED_CHUNK):
+            await conn.execute(insert(GameLeaderboardEntry), board_rows[offset:offset + SEED_CHUNK])
+    return time.perf_counter() - started
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+async def drive(client, mix: dict, users: int, concurrency: int, duration: float, rng: random.Random,
+                record: bool = True) -> dict:
+    names, weights = list(mix), list(mix.values())
+    samples = {name: {"latencies": [], "statements": 0, "errors": 0} for name in names}
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            method, path, body = ENDPOINTS[name](rng, users)
+            counter = [0]
+            token = _statements.set(counter)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+            finally:
+                elapsed = time.perf_counter() - started
+                _statements.reset(token)
+            if not record:
+                continue
+            sample = samples[name]
+            sample["latencies"].append(elapsed)
+            sample["statements"] += counter[0]
+            if response.status_code >= 400 and not (name == "rank" and response.status_code == 404):
+                sample["errors"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    report = {}
+    for name, sample in samples.items():
+        ordered = sorted(sample["latencies"])
+        count = len(ordered)
+        report[name] = {
+            "requests": count,
+            "errors": sample["errors"],
+            "throughput_rps": round(count / elapsed, 1),
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+            "queries_per_request": round(sample["statements"] / count, 2) if count else 0.0,
+        }
+    return {"elapsed_seconds": round(elapsed, 3), "endpoints": report}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results: dict):
+    print(f"{'endpoint':<13}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'p99 ms':>9}{'queries':>9}")
+    for name, row in results["endpoints"].items():
+        print(f"{name:<13}{row['requests']:>9}{row['errors']:>8}{row['throughput_rps']:>9.1f}"
+              f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}{row['queries_per_request']:>9.2f}")
+    print(f"total: {results['total_requests']} requests in {results['elapsed_seconds']}s,"
+          f" {results['throughput_rps']} req/s")
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list:
+    """Endpoints whose p95, throughput or query count got worse than baseline by more than tolerance"""
+    regressions = []
+    print(f"\n{'vs baseline':<13}{'p95 ms':>18}{'req/s':>18}{'queries':>14}")
+    for name, row in results["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base or not base["requests"] or not row["requests"]:
+            continue
+        print(f"{name:<13}{base['p95_ms']:>8.2f} -> {row['p95_ms']:<7.2f}"
+              f"{base['throughput_rps']:>8.1f} -> {row['throughput_rps']:<7.1f}"
+              f"{base['queries_per_request']:>5.2f} -> {row['queries_per_request']:<5.2f}")
+        if row["p95_ms"] > base["p95_ms"] * (1 + tolerance) and row["p95_ms"] - base["p95_ms"] > min_delta_ms:
+            regressions.append(f"{name}: p95 {base['p95_ms']}ms -> {row['p95_ms']}ms")
+        if row["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput_rps']} -> {row['throughput_rps']} req/s")
+        # Cached endpoints vary a little with hit rate; an extra query per request does not
+        if row["queries_per_request"] > base["queries_per_request"] * (1 + tolerance) + 0.05:
+            regressions.append(f"{name}: queries/request {base['queries_per_request']} -> {row['queries_per_request']}")
+    return regressions
+
+
+async def run(args) -> int:
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    seed_seconds = await seed(args.rows, args.users, args.days, rng)
+    print(f"seeded {args.rows} rows for {args.users} users in {seed_seconds:.1f}s ({engine.dialect.name})")
+
+    async with app.router.lifespan_context(app):
+        # Startup no longer warms the index; measure it warm, as it is once traffic has arrived
+        leaderboard_index.ensure_warming(SessionLocal)
+        while not leaderboard_index.is_warm:
+            await asyncio.sleep(0.05)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            if args.warmup:
+                await drive(client, mix, args.users, args.concurrency, args.warmup, rng, record=False)
+            measured = await drive(client, mix, args.users, args.concurrency, args.duration, rng)
+
+    total = sum(row["requests"] for row in measured["endpoints"].values())
+    results = {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "database": engine.dialect.name,
+        "config": {
+            "rows": args.rows, "users": args.users, "days": args.days, "concurrency": args.concurrency,
+            "duration": args.duration, "warmup": args.warmup, "mix": mix, "seed": args.seed
+        },
+        "seed_seconds": round(seed_seconds, 3),
+        "elapsed_seconds": measured["elapsed_seconds"],
+        "total_requests": total,
+        "throughput_rps": round(total / measured["elapsed_seconds"], 1),
+        "endpoints": measured["endpoints"],
+    }
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.output}")
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        status = 1 if regressions else 0
+    return status
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000, help="user_progress rows to seed")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=60, help="days of history the seeded games span")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight pairs")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for data and request order")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed fractional slowdown vs baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore p95 changes smaller than this")
+    args = parser.parse_args()
+
+    async def run_and_dispose():
+        try:
+            return await run(args)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run_and_dispose())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
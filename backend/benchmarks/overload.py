@@ -0,0 +1,166 @@
+"""Submit latency under a read flood, with and without admission control.
+
+Seeds a throwaway database, then submits games at a steady rate while
+the read endpoints are flooded at several times what they can serve: a
+few hot users hammering their history, a spike on /game-stats, and
+history for random users. Both streams are open loop, so every run is
+offered the same requests however slowly they are answered.
+Three runs, each in a fresh interpreter because the settings are read at
+import:
+
+* idle: submits only, the latency to hold on to
+* flood: the flood with ADMISSION_CONTROL=false
+* admission: the same flood with ADMISSION_CONTROL=true
+
+Reports submit p50/p95/p99 for each run and the status codes the flood
+got back. Before the runs, a write arriving at a full queue whose newest
+read was just cancelled checks that the limiter skips that read.
+
+Usage (from backend/):
+    python -m benchmarks.overload [--rows 20000] [--duration 10] [--submit-rate 50] [--flood-rate 1000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+RUNS = {
+    "idle": {"ADMISSION_CONTROL": "false"},
+    "flood": {"ADMISSION_CONTROL": "false"},
+    "admission": {"ADMISSION_CONTROL": "true"},
+}
+
+
+async def check_cancelled_read():
+    """A write meeting a full queue skips a read cancelled but not yet removed, then runs"""
+    from app.admission import ConcurrencyLimiter
+
+    limiter = ConcurrencyLimiter(limit=1, queue_size=1, timeout=1)
+    assert await limiter.acquire(write=False) is None
+    read = asyncio.create_task(limiter.acquire(write=False))
+    await asyncio.sleep(0)
+    # As when the read times out or its client leaves: cancelled, still queued for a loop iteration
+    limiter._reads[0].cancel()
+    write = asyncio.create_task(limiter.acquire(write=True))
+    await asyncio.sleep(0)
+    limiter.release()
+    assert await write is None
+    limiter.release()
+    try:
+        await read
+    except asyncio.CancelledError:
+        pass
+    assert limiter.evicted == 0 and limiter.in_flight == 0 and not limiter.queued, limiter.__dict__
+
+
+async def measure(args) -> dict:
+    import httpx
+    from app.admission import admission
+    from app.main import app
+    from benchmarks.load_test import engine, make_game, percentile, pick_user, seed
+
+    rng = random.Random(args.seed)
+    await seed(args.rows, args.users, 30, rng)
+    hot_users = [f"user-{i}" for i in range(args.hot_users)]
+    flood_paths = [
+        lambda: f"/api/progress/user/{rng.choice(hot_users)}/history?limit=50",
+        lambda: "/api/progress/game-stats",
+        lambda: f"/api/progress/user/{pick_user(rng, args.users)}/history?limit=50",
+    ]
+    submits, statuses = [], Counter()
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            deadline = time.perf_counter() + args.duration
+
+            async def submit():
+                started = time.perf_counter()
+                response = await client.post("/api/progress/", json=make_game(rng, pick_user(rng, args.users)))
+                submits.append((time.perf_counter() - started, response.status_code))
+
+            async def flood():
+                response = await client.get(rng.choice(flood_paths)())
+                statuses[response.status_code] += 1
+
+            async def open_loop(request, rate: float):
+                # A slow response does not delay the next request
+                pending = []
+                next_at = time.perf_counter()
+                while rate and next_at < deadline:
+                    pending.append(asyncio.create_task(request()))
+                    next_at += 1 / rate
+                    await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+                await asyncio.gather(*pending)
+
+            await asyncio.gather(
+                open_loop(submit, args.submit_rate),
+                open_loop(flood, args.flood_rate if args.mode != "idle" else 0),
+            )
+    await engine.dispose()
+
+    latencies = sorted(latency for latency, _ in submits)
+    return {
+        "mode": args.mode,
+        "submits": len(submits),
+        "submit_errors": sum(1 for _, status in submits if status != 200),
+        "submit_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99": round(percentile(latencies, 0.99) * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        },
+        "flood_requests": sum(statuses.values()),
+        "flood_statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "admission": admission.status() if args.mode == "admission" else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--submit-rate", type=float, default=50, help="submits per second")
+    parser.add_argument("--flood-rate", type=float, default=1000, help="flood reads per second")
+    parser.add_argument("--hot-users", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=23)
+    parser.add_argument("--mode", choices=RUNS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(asyncio.run(measure(args))))
+        return
+
+    asyncio.run(check_cancelled_read())
+    results = []
+    for mode, settings in RUNS.items():
+        env = dict(os.environ, **settings)
+        # A fresh SQLite file per run; a Postgres DATABASE_URL is reseeded by each run
+        if env.get("DATABASE_URL", "sqlite").startswith("sqlite"):
+            env["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/overload.db"
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.overload", *sys.argv[1:], "--mode", mode],
+            env=env, capture_output=True, text=True, check=True
+        )
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    print(f"{'run':<11}{'submits':>8}{'errors':>7}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}  flood responses")
+    for result in results:
+        latency = result["submit_ms"]
+        flood = ", ".join(f"{status}: {count}" for status, count in result["flood_statuses"].items()) or "-"
+        print(f"{result['mode']:<11}{result['submits']:>8}{result['submit_errors']:>7}{latency['p50']:>8}"
+              f"{latency['p95']:>8}{latency['p99']:>8}{latency['max']:>8}  {flood}")
+    admitted = results[-1]["admission"]
+    print(f"\nadmission: queued {admitted['queued']}, rejected {admitted['rejected']}, "
+          f"max queue wait {admitted['max_queue_wait_ms']} ms (latencies in ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Per-endpoint cost of fetching and serializing read responses.
+
+"before" replays the previous path: whole ORM entities, response models
+built field by field, then FastAPI's response_model validation and
+serialization rendered by the stdlib JSONResponse. "after" is the current
+path: column-only rows rendered straight from the database types, or
+validated once as dicts where a model is built, and rendered with orjson. Fetch and serialization are timed separately against the
+same seeded SQLite database.
+
+Usage (from backend/):
+    python -m benchmarks.serialization [--rows 100] [--iterations 500]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/serialization.db"
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import desc, insert, select
+
+from app.database import Base, SessionLocal, get_engine
+from app.models.user import User
+from app.models.user_progress import UserProgress, UserStats
+from app.schemas.progress_schemas import (
+    LeaderboardEntry, LeaderboardResponse, ProgressPageResponse, ProgressResponse, UserStatsResponse
+)
+from app.services.leaderboard_index import RankedUser
+from app.services.progress_service import RANKED_COLUMNS, USER_STATS_COLUMNS, progress_columns
+
+engine = get_engine()
+USER = "bench-user"
+
+
+async def seed(rows: int, users: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    now = datetime.utcnow()
+    async with SessionLocal() as db:
+        # USER gets key 1
+        await db.execute(insert(User), [{"external_id": USER if i == 0 else f"user-{i}"} for i in range(users)])
+        await db.execute(insert(UserProgress), [
+            {
+                "user_key": 1,
+                "completion_time": round(random.uniform(10, 120), 2),
+                "score": random.randint(0, 100),
+                "completed": True,
+                "lives_remaining": random.randint(0, 5),
+                "game_type": "connections",
+                "game_date": now - timedelta(minutes=i),
+                "created_at": now - timedelta(minutes=i)
+            }
+            for i in range(rows)
+        ])
+        await db.execute(insert(UserStats), [
+            {
+                "user_id": USER if i == 0 else f"user-{i}",
+                "user_key": i + 1,
+                "total_games_played": 10,
+                "best_time": round(random.uniform(10, 120), 2),
+                "average_time": 50.0,
+                "average_lives_remaining": 2.5,
+                "total_score": 100,
+                "current_streak": 1,
+                "longest_streak": 3,
+                "last_played": now
+            }
+            for i in range(users)
+        ])
+        await db.commit()
+
+
+def history_query(rows: int, *columns):
+    return select(*columns).where(UserProgress.user_key == 1)\
+        .order_by(desc(UserProgress.game_date), desc(UserProgress.id)).limit(rows)
+
+
+def leaderboard_query(*columns):
+    return select(*columns).where(UserStats.best_time.isnot(None)).order_by(UserStats.best_time).limit(50)
+
+
+async def fetch_before(rows: int):
+    async with SessionLocal() as db:
+        history = (await db.execute(history_query(rows, UserProgress))).scalars().all()
+        for entry in history:
+            entry.user_id = USER
+        stats = (await db.execute(select(UserStats).where(UserStats.user_id == USER))).scalars().first()
+        leaders = (await db.execute(leaderboard_query(UserStats))).scalars().all()
+    return history, stats, leaders
+
+
+async def fetch_after(rows: int):
+    async with SessionLocal() as db:
+        history = (await db.execute(history_query(rows, *progress_columns(USER)))).all()
+        stats = (await db.execute(select(*USER_STATS_COLUMNS).where(UserStats.user_id == USER))).first()
+        leaders = [RankedUser(*row) for row in await db.execute(leaderboard_query(*RANKED_COLUMNS))]
+    return history, stats, leaders
+
+
+def leaderboard_model(leaders) -> LeaderboardResponse:
+    entries = [
+        LeaderboardEntry(
+            user_id=user.user_id,
+            best_time=user.best_time,
+            total_games=user.total_games_played,
+            average_time=user.average_time or 0
+        )
+        for user in leaders
+    ]
+    return LeaderboardResponse(entries=entries, total_users=len(entries))
+
+
+async def fastapi_render(field, content) -> bytes:
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+
+def build_cases(before, after):
+    history_field = create_response_field("history", ProgressPageResponse)
+    list_field = create_response_field("user", List[ProgressResponse])
+    stats_field = create_response_field("stats", UserStatsResponse)
+    leaderboard_field = create_response_field("leaderboard", LeaderboardResponse)
+    (history, stats, leaders), (history_rows, stats_row, ranked) = before, after
+
+    def stats_model(row):
+        return UserStatsResponse(
+            user_id=row.user_id,
+            total_games_played=row.total_games_played,
+            best_time=row.best_time,
+            average_time=row.average_time,
+            average_lives_remaining=row.average_lives_remaining,
+            total_score=row.total_score,
+            current_streak=row.current_streak,
+            longest_streak=row.longest_streak,
+            last_played=row.last_played
+        )
+
+    return {
+        "/user/{id}": (
+            lambda: fastapi_render(list_field, history),
+            lambda: ORJSONResponse([row._asdict() for row in history_rows]).body
+        ),
+        "/user/{id}/history": (
+            lambda: fastapi_render(history_field, ProgressPageResponse(entries=history, next_cursor=None)),
+            lambda: ORJSONResponse({"entries": [row._asdict() for row in history_rows], "next_cursor": None}).body
+        ),
+        "/user/{id}/stats": (
+            lambda: fastapi_render(stats_field, stats_model(stats)),
+            lambda: ORJSONResponse(UserStatsResponse.model_validate(stats_row._asdict()).model_dump()).body
+        ),
+        "/leaderboard": (
+            lambda: fastapi_render(leaderboard_field, leaderboard_model(leaders)),
+            lambda: ORJSONResponse(leaderboard_model(ranked).model_dump()).body
+        ),
+    }
+
+
+async def time_call(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        result = fn()
+        if asyncio.iscoroutine(result):
+            await result
+    return (time.perf_counter() - started) / iterations
+
+
+async def run(args):
+    await seed(args.rows, args.users)
+
+    fetch = {}
+    for name, fn in (("before", fetch_before), ("after", fetch_after)):
+        fetch[name] = await time_call(lambda fn=fn: fn(args.rows), args.iterations // 5 or 1)
+    print(f"fetch (history {args.rows} rows + stats + top 50):"
+          f" before {fetch['before'] * 1e6:9.1f} us  after {fetch['after'] * 1e6:9.1f} us"
+          f"  ({fetch['before'] / fetch['after']:.2f}x)")
+
+    cases = build_cases(await fetch_before(args.rows), await fetch_after(args.rows))
+    print(f"{'serialization':<22}{'before us':>12}{'after us':>12}{'speedup':>10}")
+    for endpoint, (before, after) in cases.items():
+        assert json.loads(await before()) == json.loads(after()), f"{endpoint} bodies differ"
+        before_cost = await time_call(before, args.iterations)
+        after_cost = await time_call(after, args.iterations)
+        print(f"{endpoint:<22}{before_cost * 1e6:12.1f}{after_cost * 1e6:12.1f}{before_cost / after_cost:9.2f}x")
+    await engine.dispose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100, help="history entries per page")
+    parser.add_argument("--users", type=int, default=1000, help="user_stats rows for the leaderboard")
+    parser.add_argument("--iterations", type=int, default=500)
+    asyncio.run(run(parser.parse_args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Cold-start cost of a worker: import time, lifespan startup and time to first request.
+
+Each measurement runs in a fresh interpreter, the way a new worker or an
+autoreload starts:
+
+* import: `import app.main`
+* startup: entering the app's lifespan (engines, bus, background workers)
+* first response: spawn uvicorn, then poll `/` until it answers
+* first query: the first database-backed request after that
+
+The schema is migrated once beforehand, since the API no longer creates it.
+Pass --database-url with an unreachable database to check that workers
+still start and answer while the database is down.
+
+Usage (from backend/):
+    python -m benchmarks.startup_time [--runs 5] [--port 8765] [--database-url URL]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+MEASURE_IMPORT = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+MEASURE_STARTUP = """
+import asyncio, time
+from app.main import app
+async def main():
+    t = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        print(time.perf_counter() - t)
+asyncio.run(main())
+"""
+
+
+def measure(code: str, env: dict) -> float:
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def first_request(port: int, env: dict, timeout: float = 30.0) -> dict:
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            while True:
+                if time.perf_counter() - started > timeout or server.poll() is not None:
+                    raise RuntimeError(f"server did not come up: {server.stderr.read().decode()[-2000:] if server.poll() is not None else 'timeout'}")
+                try:
+                    client.get("/").raise_for_status()
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.005)
+            ready = time.perf_counter() - started
+            query_started = time.perf_counter()
+            status = client.get("/api/progress/leaderboard?limit=10").status_code
+            return {"first_response": ready, "first_query": time.perf_counter() - query_started, "query_status": status}
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def free_port(preferred: int) -> int:
+    with socket.socket() as sock:
+        try:
+            sock.bind(("127.0.0.1", preferred))
+        except OSError:
+            sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def summarize(values: list) -> dict:
+    return {
+        "median_ms": round(statistics.median(values) * 1000, 1),
+        "min_ms": round(min(values) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--database-url", help="default: a fresh, migrated SQLite file")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.database_url:
+        env["DATABASE_URL"] = args.database_url
+    else:
+        env["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/startup.db"
+        subprocess.run([sys.executable, "-m", "app.management", "migrate"], env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    # One unmeasured run so every measured one finds bytecode and the page cache warm
+    measure(MEASURE_IMPORT, env)
+    imports = [measure(MEASURE_IMPORT, env) for _ in range(args.runs)]
+    startups = [measure(MEASURE_STARTUP, env) for _ in range(args.runs)]
+    requests = [first_request(free_port(args.port), env) for _ in range(args.runs)]
+
+    print(json.dumps({
+        "database": env["DATABASE_URL"].split("://")[0],
+        "runs": args.runs,
+        "import": summarize(imports),
+        "lifespan_startup": summarize(startups),
+        "spawn_to_first_response": summarize([r["first_response"] for r in requests]),
+        "first_query": summarize([r["first_query"] for r in requests]),
+        "first_query_status": sorted({r["query_status"] for r in requests}),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Concurrency stress test for the user_stats upsert.
+
+Fires thousands of parallel submissions, spread over a handful of users
+(half of whom do not exist yet), and checks that every counter in
+user_stats matches the rows written to user_progress exactly.
+
+Usage (from backend/):
+    python -m benchmarks.stress_stats_upsert [--submits 5000] [--workers 32] [--users 20]
+
+Runs against a throwaway SQLite file unless DATABASE_URL is set.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/stress.db"
+
+from sqlalchemy import case, func, select
+
+from app.database import Base, SessionLocal, get_engine
+from app.models.user_progress import UserProgress, UserStats
+from app.schemas.progress_schemas import ProgressCreate
+from app.services.progress_service import ProgressService
+
+engine = get_engine()
+
+
+async def submit(user_id: str) -> None:
+    data = ProgressCreate(
+        user_id=user_id,
+        completion_time=round(random.uniform(10, 120), 2),
+        score=random.randint(0, 100),
+        completed=random.random() < 0.8,
+        lives_remaining=random.randint(0, 5),
+    )
+    async with SessionLocal() as db:
+        await ProgressService(db).create_progress_entry(data)
+
+
+async def check(users) -> int:
+    """Compare user_stats against user_progress and return the number of mismatches"""
+    failures = 0
+    async with SessionLocal() as db:
+        for user_id in users:
+            games, score, best, completed = (await db.execute(
+                select(
+                    func.count(UserProgress.id),
+                    func.coalesce(func.sum(UserProgress.score), 0),
+                    func.min(UserProgress.completion_time),
+                    func.coalesce(func.sum(case((UserProgress.completed == True, 1), else_=0)), 0),
+                ).where(UserProgress.user_key == UserStats.user_key, UserStats.user_id == user_id)
+            )).one()
+            stats = (await db.execute(select(UserStats).where(UserStats.user_id == user_id))).scalar_one()
+
+            expected = (games, score, best, completed)
+            actual = (stats.total_games_played, stats.total_score, stats.best_time, stats.completed_games)
+            if expected != actual:
+                failures += 1
+                print(f"MISMATCH {user_id}: expected {expected}, got {actual}")
+    return failures
+
+
+async def run(args) -> int:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    users = [f"stress-user-{i}" for i in range(args.users)]
+    # Seed half the users so both the insert and the update branch race
+    for user_id in users[: args.users // 2]:
+        await submit(user_id)
+    seeded = args.users // 2
+
+    targets = [random.choice(users) for _ in range(args.submits)]
+    started = time.perf_counter()
+    slots = asyncio.Semaphore(args.workers)
+
+    async def limited(user_id: str) -> None:
+        async with slots:
+            await submit(user_id)
+
+    await asyncio.gather(*(limited(user_id) for user_id in targets))
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.submits} submits by {args.workers} workers in {elapsed:.2f}s "
+          f"({args.submits / elapsed:.0f}/s) against {engine.dialect.name}")
+
+    failures = await check(users)
+    async with SessionLocal() as db:
+        total = await db.scalar(select(func.sum(UserStats.total_games_played)))
+    if total != args.submits + seeded:
+        failures += 1
+        print(f"MISMATCH total games: expected {args.submits + seeded}, got {total}")
+
+    print("OK: all counters exact" if failures == 0 else f"FAILED: {failures} mismatch(es)")
+    await engine.dispose()
+    return 1 if failures else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--submits", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--users", type=int, default=20)
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""Index size and lookup latency of string user ids versus integer user keys.
+
+Seeds a SQLite database in the old layout, where every user_progress row
+and index entry carries the external id string, then copies it and runs
+the user key conversion on the copy. Both files are vacuumed and
+compared:
+
+* bytes per table and index, from SQLite's dbstat table
+* latency of the history query (latest 50 games) and of an index-only
+  count, for the same random users in both layouts; the keyed side
+  includes the intern cache lookup that maps the id to its key
+
+Usage (from backend/):
+    python -m benchmarks.user_keys [--rows 200000] [--users 5000] [--lookups 2000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# The app's own engine is never used here
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/unused.db"
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.services.user_keys import migrate_user_keys
+
+# The tables as they were before user_key, including the SQLAlchemy-generated indexes
+LEGACY_SCHEMA = """
+CREATE TABLE user_progress (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id VARCHAR NOT NULL,
+    game_date DATETIME,
+    completion_time FLOAT NOT NULL,
+    score INTEGER,
+    completed BOOLEAN,
+    lives_remaining INTEGER,
+    game_type VARCHAR,
+    created_at DATETIME,
+    updated_at DATETIME
+);
+CREATE INDEX ix_user_progress_id ON user_progress (id);
+CREATE INDEX ix_user_progress_user_id ON user_progress (user_id);
+CREATE INDEX ix_user_progress_game_date ON user_progress (game_date);
+CREATE INDEX idx_user_date ON user_progress (user_id, game_date);
+CREATE INDEX idx_user_completion_time ON user_progress (user_id, completion_time);
+CREATE INDEX idx_game_type_user ON user_progress (game_type, user_id);
+CREATE TABLE user_stats (
+    id INTEGER PRIMARY KEY,
+    user_id VARCHAR NOT NULL UNIQUE,
+    total_games_played INTEGER,
+    best_time FLOAT,
+    average_time FLOAT,
+    average_lives_remaining FLOAT,
+    total_score INTEGER,
+    current_streak INTEGER,
+    longest_streak INTEGER,
+    last_played DATETIME,
+    last_played_date DATE,
+    total_completion_time FLOAT,
+    total_lives_remaining INTEGER,
+    completed_games INTEGER,
+    created_at DATETIME,
+    updated_at DATETIME
+);
+CREATE INDEX idx_user_stats_best_time ON user_stats (best_time, user_id);
+CREATE TABLE user_progress_daily (
+    id INTEGER PRIMARY KEY,
+    user_id VARCHAR NOT NULL,
+    day DATE NOT NULL,
+    game_type VARCHAR NOT NULL,
+    games_played INTEGER,
+    best_time FLOAT NOT NULL,
+    total_completion_time FLOAT,
+    total_score INTEGER,
+    total_lives_remaining INTEGER,
+    completed_games INTEGER,
+    CONSTRAINT uq_progress_daily_user_day_game UNIQUE (user_id, day, game_type)
+);
+"""
+
+GAME_TYPES = ["connections", "wordle", "crossword", "sudoku"]
+
+
+def seed(path: str, rows: int, users: int, rng: random.Random) -> list:
+    # External ids are opaque strings handed to us by the storefront
+    user_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(users)]
+    now = datetime.utcnow()
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany(
+        "INSERT INTO user_progress (user_id, game_date, completion_time, score, completed, lives_remaining,"
+        " game_type, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (user_ids[i % users] if i < users else rng.choice(user_ids),
+             (now - timedelta(seconds=rng.uniform(0, 90 * 86400))).isoformat(sep=" "),
+             round(rng.uniform(10, 300), 2), rng.randint(0, 100), 1, rng.randint(0, 5),
+             rng.choice(GAME_TYPES), now.isoformat(sep=" "), now.isoformat(sep=" "))
+            for i in range(rows)
+        )
+    )
+    conn.execute(
+        "INSERT INTO user_stats (user_id, total_games_played, best_time, total_score)"
+        " SELECT user_id, COUNT(*), MIN(completion_time), SUM(score) FROM user_progress GROUP BY user_id"
+    )
+    conn.commit()
+    conn.close()
+    return user_ids
+
+
+def sizes(path: str) -> dict:
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    result = dict(conn.execute(
+        "SELECT name, SUM(pgsize) FROM dbstat"
+        " WHERE name = 'user_progress' OR name IN (SELECT name FROM sqlite_master WHERE tbl_name = 'user_progress')"
+        " OR name IN ('user_stats', 'users') GROUP BY name"
+    ))
+    result["file"] = os.path.getsize(path)
+    conn.close()
+    return result
+
+
+def time_lookups(path: str, sample: list, sql: str, param) -> list:
+    conn = sqlite3.connect(path)
+    # Warm the page cache so both sides are measured from memory
+    for user_id in sample:
+        conn.execute(sql, (param(user_id),)).fetchall()
+    timings = []
+    for user_id in sample:
+        started = time.perf_counter()
+        conn.execute(sql, (param(user_id),)).fetchall()
+        timings.append(time.perf_counter() - started)
+    conn.close()
+    return timings
+
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=21)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp()
+    legacy, keyed = os.path.join(directory, "legacy.db"), os.path.join(directory, "keyed.db")
+
+    started = time.perf_counter()
+    user_ids = seed(legacy, args.rows, args.users, rng)
+    shutil.copy(legacy, keyed)
+    print(f"seeded {args.rows} rows for {args.users} users in {time.perf_counter() - started:.1f}s")
+
+    async def migrate():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{keyed}")
+        try:
+            return await migrate_user_keys(engine)
+        finally:
+            await engine.dispose()
+
+    started = time.perf_counter()
+    report = asyncio.run(migrate())
+    print(f"migrated {', '.join(report['tables'])} ({report['users']} users) in {time.perf_counter() - started:.1f}s")
+
+    before, after = sizes(legacy), sizes(keyed)
+    print(f"\n{'object':<28}{'string ids':>14}{'user_key':>14}{'change':>9}")
+    pairs = [
+        ("user_progress", "user_progress"),
+        ("ix_user_progress_user_id", None),
+        ("idx_user_date", "idx_user_date"),
+        ("idx_user_completion_time", "idx_user_completion_time"),
+        ("idx_game_type_user", "idx_game_type_user"),
+        ("user_stats", "user_stats"),
+        (None, "users"),
+        ("file", "file"),
+    ]
+    for old, new in pairs:
+        old_size, new_size = before.get(old, 0), after.get(new, 0)
+        change = f"{(new_size - old_size) / old_size:+.0%}" if old_size else ""
+        print(f"{old or new:<28}{old_size:>14,}{new_size:>14,}{change:>9}")
+
+    keys = dict(sqlite3.connect(keyed).execute("SELECT external_id, id FROM users"))
+    sample = [rng.choice(user_ids) for _ in range(args.lookups)]
+    queries = {
+        "history (latest 50)": (
+            "SELECT id, game_date, completion_time, score FROM user_progress"
+            " WHERE {column} = ? ORDER BY game_date DESC LIMIT 50"
+        ),
+        "count (index only)": "SELECT COUNT(*) FROM user_progress WHERE {column} = ?",
+    }
+    print(f"\n{'lookup':<22}{'string p50':>12}{'key p50':>10}{'string p99':>12}{'key p99':>10}  (us)")
+    for name, sql in queries.items():
+        by_string = time_lookups(legacy, sample, sql.format(column="user_id"), lambda user_id: user_id)
+        by_key = time_lookups(keyed, sample, sql.format(column="user_key"), keys.__getitem__)
+        print(f"{name:<22}{percentile(by_string, 50) * 1e6:>12.1f}{percentile(by_key, 50) * 1e6:>10.1f}"
+              f"{percentile(by_string, 99) * 1e6:>12.1f}{percentile(by_key, 99) * 1e6:>10.1f}")
+
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
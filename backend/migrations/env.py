@@ -0,0 +1,54 @@
+"""Alembic environment: runs migrations over the app's own async engine setup."""
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.database import DATABASE_URL, Base, build_engine, to_async_url
+# Register every table on Base.metadata for autogenerate
+from app.models import game_daily_stats, game_leaderboard, idempotency_key, progress_summary, user, user_progress  # noqa: F401
+
+config = context.config
+# Leave loggers configured by the caller (python -m app.management migrate) alone
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """Emit SQL to stdout instead of running it (`alembic upgrade head --sql`)"""
+    context.configure(
+        url=to_async_url(DATABASE_URL),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite can't ALTER most things in place; batch mode rebuilds the table
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online() -> None:
+    engine = build_engine(DATABASE_URL)
+    try:
+        async with engine.connect() as connection:
+            await connection.run_sync(do_run_migrations)
+    finally:
+        await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
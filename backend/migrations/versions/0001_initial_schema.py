@@ -0,0 +1,172 @@
+"""Initial schema
+
+Everything `Base.metadata.create_all` used to build at startup. Databases
+that predate migrations are adopted by `python -m app.management migrate`,
+which stamps them at this revision.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.database import PARTITION_PROGRESS
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('external_id', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('external_id'),
+    )
+
+    # Monthly partitions themselves are created by the migrate command and by compaction
+    op.create_table(
+        'user_progress',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_key', sa.Integer(), nullable=False),
+        sa.Column('game_date', sa.DateTime(timezone=True), server_default=sa.func.now(),
+                  nullable=not PARTITION_PROGRESS),
+        sa.Column('completion_time', sa.Float(), nullable=False),
+        sa.Column('score', sa.Integer(), nullable=True),
+        sa.Column('completed', sa.Boolean(), nullable=True),
+        sa.Column('lives_remaining', sa.Integer(), nullable=True),
+        sa.Column('game_type', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['user_key'], ['users.id']),
+        sa.PrimaryKeyConstraint('id', 'game_date') if PARTITION_PROGRESS else sa.PrimaryKeyConstraint('id'),
+        **({'postgresql_partition_by': 'RANGE (game_date)'} if PARTITION_PROGRESS else {}),
+    )
+    op.create_index('ix_user_progress_id', 'user_progress', ['id'])
+    op.create_index('ix_user_progress_game_date', 'user_progress', ['game_date'])
+    op.create_index('idx_user_date', 'user_progress', ['user_key', 'game_date'])
+    op.create_index('idx_user_completion_time', 'user_progress', ['user_key', 'completion_time'])
+    op.create_index('idx_game_type_user', 'user_progress', ['game_type', 'user_key'])
+
+    op.create_table(
+        'user_stats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('user_key', sa.Integer(), nullable=False),
+        sa.Column('total_games_played', sa.Integer(), nullable=True),
+        sa.Column('best_time', sa.Float(), nullable=True),
+        sa.Column('average_time', sa.Float(), nullable=True),
+        sa.Column('average_lives_remaining', sa.Float(), nullable=True),
+        sa.Column('total_score', sa.Integer(), nullable=True),
+        sa.Column('current_streak', sa.Integer(), nullable=True),
+        sa.Column('longest_streak', sa.Integer(), nullable=True),
+        sa.Column('last_played', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_played_date', sa.Date(), nullable=True),
+        sa.Column('total_completion_time', sa.Float(), nullable=True),
+        sa.Column('total_lives_remaining', sa.Integer(), nullable=True),
+        sa.Column('completed_games', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['user_key'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_user_stats_id', 'user_stats', ['id'])
+    op.create_index('ix_user_stats_user_id', 'user_stats', ['user_id'], unique=True)
+    op.create_index('idx_user_stats_best_time', 'user_stats', ['best_time', 'user_id'])
+    op.create_index('uq_user_stats_user_key', 'user_stats', ['user_key'], unique=True)
+
+    op.create_table(
+        'user_progress_daily',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_key', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('game_type', sa.String(), nullable=False),
+        sa.Column('games_played', sa.Integer(), nullable=True),
+        sa.Column('best_time', sa.Float(), nullable=False),
+        sa.Column('total_completion_time', sa.Float(), nullable=True),
+        sa.Column('total_score', sa.Integer(), nullable=True),
+        sa.Column('total_lives_remaining', sa.Integer(), nullable=True),
+        sa.Column('completed_games', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_key'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_key', 'day', 'game_type', name='uq_progress_daily_user_key_day_game'),
+    )
+    op.create_index('ix_user_progress_daily_id', 'user_progress_daily', ['id'])
+
+    op.create_table(
+        'game_leaderboard',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('game_type', sa.String(), nullable=False),
+        sa.Column('period', sa.String(), nullable=False),
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('games_played', sa.Integer(), nullable=True),
+        sa.Column('best_time', sa.Float(), nullable=False),
+        sa.Column('total_completion_time', sa.Float(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('game_type', 'period', 'user_id', name='uq_game_period_user'),
+    )
+    op.create_index('ix_game_leaderboard_id', 'game_leaderboard', ['id'])
+    op.create_index('idx_game_period_best_time', 'game_leaderboard', ['game_type', 'period', 'best_time', 'user_id'])
+
+    op.create_table(
+        'idempotency_keys',
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('progress_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('user_id', 'key'),
+    )
+    op.create_index('ix_idempotency_keys_progress_id', 'idempotency_keys', ['progress_id'])
+
+    op.create_table(
+        'game_daily_stats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('game_type', sa.String(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('games_played', sa.Integer(), nullable=True),
+        sa.Column('players', sa.Integer(), nullable=True),
+        sa.Column('completed_games', sa.Integer(), nullable=True),
+        sa.Column('total_completion_time', sa.Float(), nullable=True),
+        sa.Column('min_time', sa.Float(), nullable=True),
+        sa.Column('max_time', sa.Float(), nullable=True),
+        sa.Column('mean_time', sa.Float(), nullable=True),
+        sa.Column('p50_time', sa.Float(), nullable=True),
+        sa.Column('p90_time', sa.Float(), nullable=True),
+        sa.Column('p95_time', sa.Float(), nullable=True),
+        sa.Column('p99_time', sa.Float(), nullable=True),
+        sa.Column('histogram_edges', sa.JSON(), nullable=False),
+        sa.Column('histogram_counts', sa.JSON(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('game_type', 'day', name='uq_game_daily_stats_game_day'),
+    )
+    op.create_index('ix_game_daily_stats_id', 'game_daily_stats', ['id'])
+
+    op.create_table(
+        'rollup_watermarks',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('rollup_watermarks')
+    op.drop_table('game_daily_stats')
+    op.drop_table('idempotency_keys')
+    op.drop_table('game_leaderboard')
+    op.drop_table('user_progress_daily')
+    op.drop_table('user_stats')
+    op.drop_table('user_progress')
+    op.drop_table('users')